@@ -1,8 +1,22 @@
 import pygame
+import os
+import sys
 import random
 from abc import ABC, abstractmethod
 import logging
 import unittest
+import rules
+import instrument
+import textures
+import ismcts
+import endgame
+import savefile
+import journal
+import replay
+import protocol
+import perf
+from layout import Layout
+from renderer import DirtyRenderer, Layer
 
 pygame.init()
 screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
@@ -10,15 +24,24 @@ screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
 logging.basicConfig(level=logging.INFO)
 
 
-def log_func_call(func):
-    def wrapper(*args, **kwargs):
-        logging.info(f"Calling function {func.__name__}")
-        result = func(*args, **kwargs)
-        logging.info(f"Function {func.__name__} returned {result}")
-        return result
-    return wrapper
-
-
+SAVE_FILE = "save_data.dat"
+OLD_SAVE_FILE = "save_data.txt"  # text format of earlier versions, converted once
+JOURNAL_FILE = "journal.dat"  # moves of the current game, replayed after a crash
+REPLAY_FILE = "replays.dat"  # every finished game
+TRACE_FILE = "trace.json"  # frame timings of the last frames, written with the T key
+FRAME_CAP = 60  # frames per second while something moves, 0 for no limit
+IDLE_WAIT = 1000  # ms the idle loop sleeps in pygame.event.wait if no event comes
+NETWORK_POLL = 50  # ms, moves of the other player arrive on the socket, not as events
+DROP_HIGHLIGHT = (255, 215, 0)  # frame around the cards the dragged card can be dropped on
+HIGHLIGHT_WIDTH = 4
+
+state = None  # rules.GameState of the current game, the other globals are views of it
+round_status = None  # rules.RoundStatus of state, drives the buttons
+game_journal = None  # journal.Journal every move is written to
+recorder = None  # replay.ReplayWriter recording the game for the replay archive
+viewer = None  # ReplayViewer when replays are shown instead of playing
+connection = None  # protocol.Connection of a network game, the server applies the moves
+card_layout = Layout()  # where the cards are drawn, computed again when the state changes
 defender = None
 players = list()
 # pavadinimas = dict() - padaryti dictionary, iskviecia dict klases konstruktoriu
@@ -26,24 +49,36 @@ cards_to_display = dict()
 
 
 class Card:
+    rank_values = {"2": 2, "3": 3, "4": 4, "5": 5, "6": 6, "7": 7, "8": 8,
+                   "9": 9, "10": 10, "J": 11, "Q": 12, "K": 13, "A": 14}
+
     def __init__(self, rank, suit):
         self.rank = rank
-        self.rank_values = {"2": 2, "3": 3, "4": 4, "5": 5, "6": 6, "7": 7, "8": 8,
-                            "9": 9, "10": 10, "J": 11, "Q": 12, "K": 13, "A": 14}
         self.suit = suit
-        self.image = pygame.transform.scale(pygame.image.load(
-            f"Images\\{self.rank}_of_{self.suit}.png").convert_alpha(), (100, 150))
-        self.rect = self.image.get_rect()
+        self.id = rules.card_id(rank, suit)
+        self.rect = pygame.Rect((0, 0), textures.CARD_SIZE)
+
+    @property
+    def image(self):  # shared texture, decoded the first time any card needs it
+        return textures.registry.card(self.rank, self.suit)
 
     def __str__(self):
         return f"{self.rank} of {self.suit}"
 
-    def draw(self, pos=None):  # draw card on screen
+    def __eq__(self, other):
+        return isinstance(other, Card) and self.id == other.id
+
+    def __hash__(self):
+        return self.id
+
+    def draw(self, pos=None, surface=None):  # draw card on screen (or on surface)
+        if surface is None:
+            surface = screen
         if pos:
-            screen.blit(self.image, pos)
+            surface.blit(self.image, pos)
         else:
             pos = self.rect.topleft
-            screen.blit(self.image, pos)
+            surface.blit(self.image, pos)
 
     def set_top_left(self, pos):
         self.rect.topleft = pos
@@ -75,45 +110,51 @@ class Cards:
         return self.cards
 
 
-class SingletonMeta(type):
-    _instances = {}
-
-    def __call__(cls, *args, **kwargs):
-        if cls not in cls._instances:
-            instance = super().__call__(*args, **kwargs)
-            cls._instances[cls] = instance
-        return cls._instances[cls]
-
-
-class Deck(Cards, metaclass=SingletonMeta):
-    def __init__(self):
+class Deck(Cards):  # every game has its own deck
+    def __init__(self, seed=None, stream=0):
         super().__init__()
-        self.create_cards()
+        self.create_cards()  # self.cards never changes size, dealing moves self.top
+        self.cards_by_id = list(self.cards)  # card objects indexed by rules card id
+        self.top = 0  # self.cards[self.top:] are left in the deck, in drawing order
+        if seed is None:  # a new game, the seed is kept so it can be played again
+            seed = random.getrandbits(64)
+        self.seed = seed
+        self.rng = rules.stream(seed, stream)  # every stream of a seed deals other games
         self.shuffle_deck()
         self.trump_card = self.get_trump_card()
         self.trump_card_taken = False
 
-    def shuffle_deck(self):
-        random.shuffle(self.cards)
+    def __len__(self):  # cards left in the deck
+        return len(self.cards) - self.top
+
+    def shuffle_deck(self):  # shuffle the cards left in the deck
+        left = self.cards[self.top:]
+        self.rng.shuffle(left)
+        self.cards[self.top:] = left
 
     def deal_cards(self, num_cards, hand):
-        for card in self.cards[:num_cards]:  # deal numcard cards from the deck
-            hand.append(card)
-        if (num_cards > len(self.cards) and not self.trump_card_taken):
+        top = self.top
+        end = top + num_cards
+        hand += self.cards[top:end]  # deal num_cards cards, the rest of the deck stays put
+        if (end > len(self.cards) and not self.trump_card_taken):
             hand.append(self.trump_card)
             self.trump_card_taken = True
-        self.cards = self.cards[num_cards:]  # remove dealt cards from the deck
+        self.top = min(end, len(self.cards))
         return hand
 
     def get_trump_card(self):  # trump card is the first card in the deck
-        if self.cards:
-            trump_card = self.cards.pop(0)
-            trump_card.image = pygame.transform.scale(pygame.image.load(
-                f"Images\\{trump_card.rank}_of_{trump_card.suit}.png"), (100, 150))
-            return trump_card
+        if self.top < len(self.cards):
+            self.top += 1
+            return self.cards[self.top - 1]
         else:
             return None
 
+    def set_cards(self, cards):  # the deck of a loaded game, in drawing order
+        # the dealt cards move in front, self.cards still holds every card once
+        left = set(cards)
+        self.cards[:] = [card for card in self.cards if card not in left] + list(cards)
+        self.top = len(self.cards) - len(cards)
+
 
 class AbstractPlayer(ABC):
     def __init__(self, deck):
@@ -123,6 +164,10 @@ class AbstractPlayer(ABC):
         self._dragging = False
         self._dragged_card = None
         self._original_index = None
+        self._drag_state = None  # state the drop targets were found in
+        self._drop_targets = set()  # attack cards the dragged card beats
+        self._drop_move = None  # attack, throw-in or transfer move of the dragged card
+        self._hand_layer = Layer()  # the hand, composed again when its cards change
 
     card_width = 100
     stack_gap = 10
@@ -137,12 +182,11 @@ class AbstractPlayer(ABC):
     def is_visible(self):
         return self._visible
 
-    def draw_hand(self, screen, offset, y_position):  # draw player hand on screen
-        max_cards_in_row = 8
-        for i, card in enumerate(self._hand):  # for card in hand
-            card.set_top_left((i % max_cards_in_row*(self.card_width +
-                              self.stack_gap) + offset, y_position + i//max_cards_in_row*35))
-            card.draw()
+    def draw_hand(self, screen, background=None):  # draw player hand on screen
+        player = players.index(self)
+        hand = card_layout.hands[player]
+        self._hand_layer.draw(screen, card_layout.hand_versions[player],
+                              lambda: [(card.image, rect) for card, rect in hand], background)
 
     @abstractmethod
     def event_handler(self, event):
@@ -153,7 +197,10 @@ class AbstractPlayer(ABC):
         pass
 
     @abstractmethod
-    def draw_dragged_card(self):
+    def draw_dragged_card(self, screen=None):
+        pass
+
+    def observe(self, state, move, new_state):  # called after every move of both players
         pass
 
 
@@ -179,55 +226,47 @@ class Player(AbstractPlayer):
         if event.type == pygame.MOUSEBUTTONDOWN:  # check for card click
             if event.button == 1:
                 mouse_pos = pygame.mouse.get_pos()
-                cards_clicked = [card for card in self._hand if card.rect.collidepoint(
-                    mouse_pos)]  # cards that the mouse is over
-                if cards_clicked:  # if there are cards that were clicked
-                    # get the card on top
-                    card_clicked = cards_clicked[len(cards_clicked) - 1]
-                    cards_clicked.clear()
+                # the card on top of the others where the mouse is
+                card_clicked = card_layout.hand_card_at(players.index(self), mouse_pos)
+                if card_clicked is not None:
                     if not self._dragging:
                         self._dragging = True
                         self._dragged_card = card_clicked
                         self._original_index = self._hand.index(card_clicked)
+                        self.find_drop_targets()
                         return
 
         elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:  # check for card release
             if self._dragging:
                 self._dragging = False
-                if isDefender(self) == 0:  # attacker
-                    # print("A: attacker " + self.name + " played a card against defender " + defender.name)
-                    if self.num_cards_played == 0:
-                        card = self._hand.pop(self._original_index)
-                        cards_to_display[card] = None
-                        self.num_cards_played += 1
-                    else:
-                        for attacker_card, defender_card in cards_to_display.items():
-                            if attacker_card.rank == self._dragged_card.rank:
-                                card = self._hand.pop(self._original_index)
-                                cards_to_display[card] = None
-                                self.num_cards_played += 1
-                                break
-                            if defender_card != None:
-                                if defender_card.rank == self._dragged_card.rank:
-                                    card = self._hand.pop(self._original_index)
-                                    cards_to_display[card] = None
-                                    self.num_cards_played += 1
-                                    break
-                    self._dragged_card = None
-                    self._original_index = None
-                else:  # defender
-                    # print("B: defender tried playing a card")
-                    opponent = players[1-players.index(self)]
-                    self.card_to_defend = self.check_boundaries(
-                        screen, opponent)
-                    if not self.card_to_defend == None and cards_to_display[self.card_to_defend] == None:  # card released on top of opponents card and it has not been defended yet?\
-                        if self.is_valid_move(self.deck, self._dragged_card):
-                            # print("C: defender played a card (dragged card over opponents card)")
-                            self._hand.pop(self._original_index)
-                            cards_to_display[self.card_to_defend] = self._dragged_card
-                            self.num_cards_played += 1
-                    self._dragged_card = None
-                    self._original_index = None
+                if self._drag_state is not state:  # the other player moved during the drag
+                    self.find_drop_targets()
+                self.card_to_defend = card_layout.attack_card_at(event.pos)
+                if self.card_to_defend in self._drop_targets:  # defender beats the card
+                    apply_move((rules.DEFEND, self._dragged_card.id, self.card_to_defend.id))
+                elif self._drop_move is not None and \
+                        card_layout.on_table(players.index(self), event.pos):
+                    apply_move(self._drop_move)  # attack, throw in or transfer
+                # dropped anywhere else, the card goes back to the hand
+                self._dragged_card = None
+                self._original_index = None
+                self._drop_targets = set()
+                self._drop_move = None
+
+    def find_drop_targets(self):  # legal moves of the dragged card, found once per drag
+        self._drag_state = state
+        self._drop_targets = set()
+        self._drop_move = None
+        if state.turn != players.index(self):
+            return
+        for move in rules.legal_moves(state):
+            kind, card, target = move
+            if card != self._dragged_card.id:
+                continue
+            if kind == rules.DEFEND:
+                self._drop_targets.add(self.deck.cards_by_id[target])
+            elif kind in (rules.ATTACK, rules.TRANSFER):
+                self._drop_move = move
 
     def update(self):  # update dragged card position
         if self._dragging:
@@ -235,72 +274,83 @@ class Player(AbstractPlayer):
             self._dragged_card.rect.centerx = mouse_pos[0]
             self._dragged_card.rect.centery = mouse_pos[1]
 
-    def draw_dragged_card(self):
+    def draw_dragged_card(self, screen=None):
         if self._dragging and self._dragged_card is not None:
             card = self._dragged_card
             card.rect.center = pygame.mouse.get_pos()
-            card.draw()
+            if self._drop_move is not None:  # can be played anywhere on the table
+                screen.fill(DROP_HIGHLIGHT, card.rect.inflate(2 * HIGHLIGHT_WIDTH,
+                                                              2 * HIGHLIGHT_WIDTH))
+            card.draw(surface=screen)
 
     # draw cards played by both players
+    # attack cards, then the defending cards on top of them, in one blits call
     def draw_cards_to_display(self, screen, is_defender, opponent):
+        if self._dragging and self._drop_targets:  # frames around the cards it beats
+            for card, rect, _, _ in card_layout.table:
+                if card in self._drop_targets:
+                    screen.fill(DROP_HIGHLIGHT, rect.inflate(2 * HIGHLIGHT_WIDTH,
+                                                             2 * HIGHLIGHT_WIDTH))
+        screen.blits([(card.image, rect.topleft) for card, rect, _, _ in card_layout.table] +
+                     [(card.image, rect.topleft) for _, _, card, rect in card_layout.table
+                      if card is not None])
+
+    @instrument.probe()
+    def is_valid_move(self, deck, defender_card):
+        return rules.beats(defender_card.id, self.card_to_defend.id,
+                           rules.suit_of(deck.trump_card.id))
 
-        if is_defender == 0:  # attacker
-            self.draw_attackers_played_cards(screen, self)
-        else:  # defender
-            self.draw_attackers_played_cards(screen, opponent)
-        self.draw_defenders_played_cards()
-
-    # draw cards played by the attacker
-    def draw_attackers_played_cards(self, screen, attacker):
-
-        card_width = 100
-        stack_gap = 20  # horizontal gap between cards
-
-        initial_x = screen.get_width() // 2 - ((attacker.num_cards_played - 1)
-                                               * (card_width + stack_gap) // 2)
-        initial_y = screen.get_height() // 2
-
-        for i, card in enumerate(cards_to_display):  # for card played by attacker
-            card.rect.centerx = initial_x + (i * (card_width + stack_gap))
-            card.rect.centery = initial_y
-            card.draw()
-
-    def draw_defenders_played_cards(self):  # draw cards played by the defender
-        # how much lower the defenders cards are displayed than the attackers
-        defender_card_offset_y = 40
-        defender_cards_to_display = {
-            key: value for key, value in cards_to_display.items() if value is not None}
-        for attacker_card, defender_card in defender_cards_to_display.items():
-            defender_card.rect.centerx = attacker_card.rect.centerx
-            defender_card.rect.centery = attacker_card.rect.centery + defender_card_offset_y
-            defender_card.draw()
-
-    # returns the index of the card the dragged card is released on top of
-    def check_boundaries(self, screen, player):
-        card_height = 150
-        card_width = 100
-        stack_gap = 20  # horizontal gap between cards
-
-        mouse_pos = pygame.mouse.get_pos()
-
-        initial_x = screen.get_width() // 2 - ((player.num_cards_played - 1)
-                                               * (card_width + stack_gap) // 2)
-        initial_y = screen.get_height() // 2
-
-        for i, card in enumerate(cards_to_display):
-            if initial_x + (i * (card_width + stack_gap)) - card_width // 2 <= mouse_pos[0] <= initial_x + (i * (card_width + stack_gap)) + card_width // 2 and initial_y - card_height // 2 <= mouse_pos[1] <= initial_y + card_height // 2:
-                return card
-        return None
 
-    @log_func_call
-    def is_valid_move(self, deck, defender_card):
-        attacker_card = self.card_to_defend
-        if defender_card.suit == attacker_card.suit and defender_card > attacker_card:
-            return True
-        elif defender_card.suit == deck.trump_card.suit and attacker_card.suit != deck.trump_card.suit:
-            return True
-        else:
+class ComputerPlayer(Player):  # plays with ISMCTS, the search runs in worker processes
+    def __init__(self, deck, name, hand_position, time_budget=0.2, workers=os.cpu_count() or 1):
+        self.knowledge = ismcts.Knowledge(len(players))
+        super().__init__(deck, name, hand_position)
+        self.search = ismcts.ISMCTS(time_budget, workers)
+        self._pending = None  # (state the search started from, running search)
+
+    def event_handler(self, event):  # moves are chosen by the search, not the mouse
+        pass
+
+    def update(self):
+        pass
+
+    def draw_dragged_card(self, screen=None):
+        pass
+
+    def observe(self, state, move, new_state):
+        self.knowledge.observe(state, move, new_state)
+
+    def reset_knowledge(self):  # the game was loaded, nothing is known about it
+        self.knowledge = ismcts.Knowledge(players.index(self))
+        self._pending = None
+
+    def play(self):  # returns True if a move was made, never blocks the game loop
+        if players[state.turn] is not self:
+            self._pending = None
+            return False
+        if self._pending is None or self._pending[0] is not state:
+            self._pending = (state, self.search.start(
+                state, state.turn, self.knowledge.opponent_cards))
+        search = self._pending[1]
+        if not search.done():
             return False
+        self._pending = None
+        apply_move(search.best_move())
+        return True
+
+    def close(self):
+        self.search.close()
+
+
+class RemotePlayer(Player):  # plays on another computer, its moves come from the server
+    def event_handler(self, event):
+        pass
+
+    def update(self):
+        pass
+
+    def draw_dragged_card(self, screen=None):
+        pass
 
 
 def isDefender(player):  # is the player the defender?
@@ -310,296 +360,343 @@ def isDefender(player):  # is the player the defender?
         return 0
 
 
-def check_win(deck):  # check if the game has ended
-    if (len(deck.cards)) == 0:  # if the deck is empty
-        for player in players:
-            if (player.num_cards_in_hand == 0):  # if a player has no cards left
-                # if the other player also has no cards left
-                if players[1 - players.index(player)].num_cards_in_hand == 0:
-                    print("Tie!")
-                else:  # the other player has cards left
-                    print(player.name + " wins!")
-                return True
-
-    return False
-
-
-# save cards in deck, trump card, player turn, player hands, defender and cards played this round
-def save_data(deck, player1, player2):
-    global defender
-    global cards_to_display
-
-    with open("save_data.txt", "w") as file:
+def check_win():  # check if the game has ended
+    result = round_status.result
+    if result is None:
+        return False
+    if result == rules.TIE:  # both players have no cards left
+        print("Tie!")
+    else:  # the other player has cards left
+        print(players[result].name + " wins!")
+    return True
 
-        cards = "cards = ["
-        if len(deck.cards) > 0:
-            for card in deck.cards:
-                cards += "Card('" + card.rank + "', '" + card.suit + "'), "
-            cards = cards[:-2]  # remove the last comma
-        else:
-            cards += "None"
-        file.write(cards + "]\n")
-
-        trump_card = "trump card = Card('" + deck.trump_card.rank + \
-            "', '" + deck.trump_card.suit + "')\n"
-        file.write(trump_card)
-
-        trump_card_taken = "trump card taken = " + \
-            str(deck.trump_card_taken) + "\n"
-        file.write(trump_card_taken)
-
-        defender_line = "defender = " + defender.name + "\n"
-        file.write(defender_line)
-
-        player1_visible = "player1_visible = " + \
-            str(player1.is_visible()) + "\n"
-        file.write(player1_visible)
-
-        attacker_cards_played = "Attacker cards played = ["
-        if len(cards_to_display) > 0:
-            for attacker_card in cards_to_display.keys():
-                attacker_cards_played += "Card('" + attacker_card.rank + \
-                    "', '" + attacker_card.suit + "'), "
-            # remove the last comma
-            attacker_cards_played = attacker_cards_played[:-2]
-        else:
-            attacker_cards_played += "None"
-        file.write(attacker_cards_played + "]\n")
-
-        defender_cards_played = "Defender cards played = ["
-        if len(cards_to_display) > 0:
-            for defender_card in cards_to_display.values():
-                if defender_card != None:
-                    defender_cards_played += "Card('" + defender_card.rank + \
-                        "', '" + defender_card.suit + "'), "
-                else:
-                    defender_cards_played += "None, "
-            # remove the last comma
-            defender_cards_played = defender_cards_played[:-2]
-        else:
-            defender_cards_played += "None"
-        file.write(defender_cards_played + "]\n")
-
-        player1_hand = "Player 1 hand = ["
-        if len(player1._hand) > 0:
-            for card in player1._hand:
-                player1_hand += "Card('" + card.rank + \
-                    "', '" + card.suit + "'), "
-            player1_hand = player1_hand[:-2]  # remove the last comma
-        else:
-            player1_hand += "None"
-        file.write(player1_hand + "]\n")
-
-        player2_hand = "Player 2 hand = ["
-        if len(player2._hand) > 0:
-            for card in player2._hand:
-                player2_hand += "Card('" + card.rank + \
-                    "', '" + card.suit + "'), "
-            player2_hand = player2_hand[:-2]  # remove the last comma
-        else:
-            player2_hand += "None"
-        file.write(player2_hand + "]\n")
 
-        print("Data saved")
+def arrival_order(previous):  # order in which cards can join a hand after previous
+    if previous is None:
+        return []
+    taken = [attack for attack, _ in previous.table] + \
+        [defense for _, defense in previous.table if defense is not None]
+    return taken + list(previous.deck) + [previous.trump]
 
 
-def load_data(deck, player1, player2):  # load data from save file
+def set_state(new_state, move=None):  # make the game objects show new_state
+    global state
     global defender
-    global cards_to_display
-    with open("save_data.txt", "r") as file:
-        lines = file.readlines()
-
-        # check if all lines containing the data are in the file
-        # cards = [Card('A', 'spades'), Card('K', 'spades'), ...]
-        cards_line = next((line for line in lines if "cards = " in line), None)
-        if cards_line == None:
-            print("No saved cards found")
-            return
-
-        trump_card_taken_line = next(
-            # trump card taken = True
-            (line for line in lines if "trump card taken = " in line), None)
-        if trump_card_taken_line == None:
-            print("No saved trump card taken found")
-            return
+    global round_status
+    previous = state
+    state = new_state
+    if move is not None and round_status is not None:  # new_state follows the move
+        round_status.update(move, state)
+    else:
+        round_status = rules.RoundStatus(state)
+    deck = players[0].deck
 
-        # trump card = Card('A', 'spades')
-        trump_card_line = next(
-            (line for line in lines if "trump card = " in line), None)
-        if trump_card_line == None:
-            print("No saved trump card found")
-            return
+    deck.set_cards([deck.cards_by_id[card] for card in state.deck])
+    deck.trump_card = deck.cards_by_id[state.trump]
+    deck.trump_card_taken = state.trump_taken
 
-        # defender = player1
-        defender_line = next(
-            (line for line in lines if "defender = " in line), None)
-        if defender_line == None:
-            print("No saved defender found")
-            return
+    for i, player in enumerate(players):
+        # cards stay where they were in the hand, new ones are added at the end
+        hand_mask = state.hands[i]
+        player._hand = [card for card in player._hand if hand_mask >> card.id & 1]
+        new_cards = hand_mask & ~rules.mask_of(card.id for card in player._hand)
+        for card in arrival_order(previous) + list(rules.cards_of(new_cards)):
+            if new_cards >> card & 1:
+                player._hand.append(deck.cards_by_id[card])
+                new_cards &= ~(1 << card)
+        player.num_cards_in_hand = len(player._hand)
+        if viewer is not None:  # replays show both hands
+            player._visible = True
+        elif any(isinstance(other, (ComputerPlayer, RemotePlayer)) for other in players):
+            # against the computer or over the network only the local player's hand is shown
+            player._visible = not isinstance(player, (ComputerPlayer, RemotePlayer))
+        else:
+            player._visible = i == state.turn
 
-        player1_visible_line = next(
-            # player1_visible = True
-            (line for line in lines if "player1_visible = " in line), None)
-        if player1_visible_line == None:
-            print("No saved player 1 visibility found")
-            return
+    cards_to_display.clear()
+    for attack, defense in state.table:
+        cards_to_display[deck.cards_by_id[attack]] = None if defense is None \
+            else deck.cards_by_id[defense]
 
-        # Attacker cards played = [Card('A', 'spades'), Card('K', 'spades'), ...]
-        attacker_cards_played_line = next(
-            (line for line in lines if "Attacker cards played = " in line), None)
-        if attacker_cards_played_line == None:
-            print("No saved attacker cards played found")
-            return
+    defender = players[state.defender]
+    defender.num_cards_played = round_status.defended
+    players[state.attacker].num_cards_played = round_status.played
+    update_layout()
 
-        # Defender cards played = [Card('A', 'spades'), Card('K', 'spades'), ...]
-        defender_cards_played_line = next(
-            (line for line in lines if "Defender cards played = " in line), None)
-        if defender_cards_played_line == None:
-            print("No saved defender cards played found")
-            return
 
-        # Player 1 hand =  [Card('A', 'spades'), Card('K', 'spades'), ...]
-        player1_hand_line = next(
-            (line for line in lines if "Player 1 hand = " in line), None)
-        if player1_hand_line == None:
-            print("No saved player 1 hand found")
-            return
+def update_layout():  # place the cards of the hands and the table
+    card_layout.update(screen.get_size(), [(player._hand, player.hand_position)
+                                           for player in players],
+                       list(cards_to_display.items()))
 
-        # Player 2 hand =  [Card('A', 'spades'), Card('K', 'spades'), ...]
-        player2_hand_line = next(
-            (line for line in lines if "Player 2 hand = " in line), None)
-        if player2_hand_line == None:
-            print("No saved player 2 hand found")
-            return
 
-        # load data from the file
-
-        # deck
-        if not cards_line == "cards = [None]\n":
-            # leaves only the object constructors [Card('A', 'spades'), Card('K', 'spades'), ...]
-            cards_line = cards_line.replace("cards = ", "")
-            cards_line = cards_line[:-1]  # removes \n at the end
-            cards = eval(cards_line)  # creates a list of card objects
-            deck.cards = cards
-
-        # trump card taken
-        trump_card_taken_line = trump_card_taken_line.replace(
-            "trump card taken = ", "")  # leaves only the boolean value
-        deck.trump_card_taken = eval(trump_card_taken_line)
-
-        # trump card
-        # leaves only the object constructor (Card('A', 'spades'))
-        trump_card_line = trump_card_line.replace("trump card = ", "")
-        trump_card_line = trump_card_line[:-1]  # removes \n at the end
-        trump_card = eval(trump_card_line)  # creates a card object
-        deck.trump_card = trump_card
-
-        # defender
-        defender_line = defender_line.replace(
-            "defender = ", "")  # leaves only the player name
-        if defender_line == "player1":
-            defender = player1
-        else:
-            defender = player2
+def apply_move(move):  # play a rules move and update the game objects
+    if connection is not None:  # the server applies it and sends the new state back
+        connection.send(protocol.encode_move(move))
+        return
+    previous = state
+    set_state(rules.apply(state, move), move)
+    for player in players:
+        player.observe(previous, move, state)
+    if game_journal is not None and game_journal.append(move):
+        game_journal.snapshot(state, current_hands())
+    if recorder is not None and recorder.record(move):
+        recorder.keyframe(state, current_hands())
 
-        # player visibility
-        player1_visible_line = player1_visible_line.replace(
-            "player1_visible = ", "")  # leaves only the boolean value
-        player1_visible = eval(player1_visible_line)
 
-        player1._visible = player1_visible
-        player2._visible = not player1_visible
+def current_hands():  # card ids of every hand in the order they are shown
+    return [[card.id for card in player._hand] for player in players]
 
-        # cards played this round
-        cards_to_display.clear()
 
-        if not attacker_cards_played_line == "Attacker cards played = [None]\n":
+def restore_state(new_state, hands):  # show a loaded game, hands in the saved order
+    deck = players[0].deck
+    for player, hand in zip(players, hands):
+        player._hand = [deck.cards_by_id[card] for card in hand]
+    set_state(new_state)
+    for player in players:
+        if isinstance(player, ComputerPlayer):
+            player.reset_knowledge()
 
-            # leaves only the object constructors [Card('A', 'spades'), Card('K', 'spades'), ...]
-            attacker_cards_played_line = attacker_cards_played_line.replace(
-                "Attacker cards played = ", "")
-            attacker_cards_played_line = attacker_cards_played_line[:-1]
-            attacker_cards = eval(attacker_cards_played_line)
 
-            # leaves only the object constructors [Card('A', 'spades'), Card('K', 'spades'), ...]
-            defender_cards_played_line = defender_cards_played_line.replace(
-                "Defender cards played = ", "")
-            defender_cards_played_line = defender_cards_played_line[:-1]
-            defender_cards = eval(defender_cards_played_line)
+@instrument.probe()
+def save_data(deck, player1, player2):  # save the game, hands keep their order
+    savefile.save(SAVE_FILE, state, current_hands())
 
-            for attacker_card, defender_card in zip(attacker_cards, defender_cards):
-                if defender_card == None:
-                    cards_to_display[attacker_card] = None
-                else:
-                    cards_to_display[attacker_card] = defender_card
-
-        # player hands
-        if not player1_hand_line == "Player 1 hand = [None]\n":
-            # leaves only the object constructors [Card('A', 'spades'), Card('K', 'spades'), ...]
-            player1_hand_line = player1_hand_line.replace(
-                "Player 1 hand = ", "")
-            player1_hand_line = player1_hand_line[:-1]  # removes \n at the end
-            # creates a list of card objects
-            player1_hand = eval(player1_hand_line)
-            player1._hand = player1_hand
-            player1.num_cards_in_hand = len(player1._hand)
-        else:
-            player1._hand = []
-            player1.num_cards_in_hand = 0
-
-        if not player2_hand_line == "Player 2 hand = [None]\n":
-            # leaves only the object constructors [Card('A', 'spades'), Card('K', 'spades'), ...]
-            player2_hand_line = player2_hand_line.replace(
-                "Player 2 hand = ", "")
-            player2_hand_line = player2_hand_line[:-1]
-            # creates a list of card objects
-            player2_hand = eval(player2_hand_line)
-            player2._hand = player2_hand
-            player2.num_cards_in_hand = len(player2._hand)
-        else:
-            player2._hand = []
-            player2.num_cards_in_hand = 0
 
-        if (isDefender(player1)):
-            player1.num_cards_played = sum(
-                1 for card in cards_to_display.values() if not card == None)
+@instrument.probe()
+def load_data(deck, player1, player2):  # load data from save file
+    try:
+        if not os.path.exists(SAVE_FILE) and os.path.exists(OLD_SAVE_FILE):
+            savefile.convert(OLD_SAVE_FILE, SAVE_FILE)  # saved by an older version
+            print("Converted " + OLD_SAVE_FILE + " to " + SAVE_FILE)
+        loaded_state, hands = savefile.load(SAVE_FILE)
+    except FileNotFoundError:
+        print("No saved game found")
+        return
+    except savefile.SaveError as error:
+        print(error)
+        return
+    if loaded_state.profile is not rules.CLASSIC and \
+            any(isinstance(player, ComputerPlayer) for player in players):
+        print("The computer only plays the classic rules")
+        return
+
+    # the deck's card objects are reused, the hands are put back in the saved order
+    restore_state(loaded_state, hands)
+    if game_journal is not None:
+        game_journal.start(state, current_hands())
+    if recorder is not None:
+        recorder.begin(state, current_hands())
+
+
+class ReplayViewer:  # shows the games of a replay archive move by move
+    def __init__(self, archive):
+        self.archive = archive
+        self.num_games = None  # counted when it is first shown
+        self.game_index = 0
+        self.game = archive.game(0)
+        self.move = 0  # go_to(0) shows it once the viewer is set, set_state looks at it
+
+    def go_to(self, move):  # jump to the state before the move with that number
+        move = max(0, min(move, self.game.num_moves))
+        if move == self.move + 1:  # next move, no need to go back to a keyframe
+            played = self.game.moves(self.move, move)[0]
+            set_state(rules.apply(state, played, validate=False), played)
         else:
-            player1.num_cards_played = sum(
-                1 for card in cards_to_display.keys())
+            keyframe, hands, moves = self.game.keyframe_before(move)
+            restore_state(keyframe, hands)
+            for played in moves:
+                set_state(rules.apply(state, played, validate=False), played)
+        self.move = move
+
+    def show(self, move):  # go_to, a damaged replay stays at the move shown before
+        try:
+            self.go_to(move)
+        except replay.ReplayError as error:
+            print("Can not show move " + str(move) + ": " + str(error))
+
+    def show_game(self, index):
+        previous = self.game
+        try:
+            self.game = self.archive.game(index)
+            self.go_to(0)
+        except IndexError:  # first or last game
+            self.game = previous
+            return
+        except replay.ReplayError as error:
+            print("Can not show game " + str(index + 1) + ": " + str(error))
+            self.game = previous
+            return
+        self.game_index = index
+
+    def key_pressed(self, key):
+        if key == pygame.K_RIGHT:
+            self.show(self.move + 1)
+        elif key == pygame.K_LEFT:
+            self.show(self.move - 1)
+        elif key == pygame.K_PAGEDOWN:
+            self.show(self.move + 10)
+        elif key == pygame.K_PAGEUP:
+            self.show(self.move - 10)
+        elif key == pygame.K_HOME:
+            self.show(0)
+        elif key == pygame.K_END:
+            self.show(self.game.num_moves)
+        elif key == pygame.K_DOWN:
+            self.show_game(self.game_index + 1)
+        elif key == pygame.K_UP:
+            self.show_game(self.game_index - 1)
+
+    def caption(self):
+        if self.num_games is None:
+            self.num_games = len(self.archive)
+        return "Game " + str(self.game_index + 1) + "/" + str(self.num_games) + \
+            "   Move " + str(self.move) + "/" + str(self.game.num_moves)
+
+
+HINT_TIME = 0.1  # seconds the solver may search for a hint, the window waits for it
+
+
+def show_hint():  # print the best move of the player whose turn it is
+    if state.profile is not rules.CLASSIC:  # the solver knows the classic rules only
+        print("Hints are only available with the classic rules")
+        return
+    if not state.deck_empty():
+        print("Hints are available once the deck is empty")
+        return
+    try:
+        result, move = endgame.solve(state, time_limit=HINT_TIME)
+    except endgame.SearchLimit:
+        print("Too many cards left for a hint")
+        return
+    if move is None:
+        return
+    player = players[state.turn]
+    if result == rules.TIE:
+        outcome = "the game ends in a tie"
+    else:
+        outcome = players[result].name + " wins"
+    kind, card, target = move
+    if kind == rules.ATTACK:
+        advice = "play " + rules.card_name(card)
+    elif kind == rules.DEFEND:
+        advice = "beat " + rules.card_name(target) + " with " + rules.card_name(card)
+    elif kind == rules.TAKE:
+        advice = "take the cards"
+    elif kind == rules.END_ROUND:
+        advice = "end the round"
+    else:
+        advice = "press next turn"
+    print("Hint for " + player.name + ": " + advice + ", with best play " + outcome)
 
 
-def is_enabled(button):  # check if the button can be pressed and is visible
+def button_move(button):  # the rules move made by pressing the button
+    if button == "next_button":
+        return (rules.PASS, None, None)
+    elif button == "end_round_button":
+        if round_status.turn == round_status.defender:  # "Take cards"
+            return (rules.TAKE, None, None)
+        return (rules.END_ROUND, None, None)
 
-    end_round_button_enabled = False
-    next_button_enabled = False
 
-    not_all_cards_defended = False
-    for defender_card in cards_to_display.values():  # if there are undefended cards
-        if defender_card == None:
-            not_all_cards_defended = True
+def is_enabled(button):  # check if the button can be pressed and is visible
+    if viewer is not None:  # replays can not be played
+        return False
+    # the computer is thinking or the other player moves on another computer
+    if isinstance(players[round_status.turn], (ComputerPlayer, RemotePlayer)):
+        return False
+    return round_status.allows(button_move(button)[0])
+
+
+def join_table(address, table, profile=rules.CLASSIC):
+    # connect to a server, returns (seat, state) or None
+    global connection
+    try:
+        connection = protocol.Connection(*address)
+    except OSError as error:
+        print("Can not connect to " + address[0] + ":" + str(address[1]) + ": " + str(error))
+        return None
+    connection.send(protocol.encode_join(table, profile))
+    print("Waiting for another player")
+    while not connection.closed:  # the window stays responsive while waiting
+        if any(event.type == pygame.QUIT for event in pygame.event.get()):
             break
-
-    for i, player in enumerate(players):
-        if player.is_visible():  # this player's turn
-            if isDefender(player):  # defender
-                if not_all_cards_defended:
-                    end_round_button_enabled = True
+        for body in connection.receive():
+            if body[0] == protocol.SEATED:
+                _, number, seat = protocol.SEATED_BODY.unpack(body)
+                print("Playing at table " + str(number) + " as player" + str(seat + 1))
+            elif body[0] == protocol.VIEW:  # both players are there, the game starts
+                return protocol.decode_view(body)
+            elif body[0] == protocol.REJECTED:
+                if body[1] == protocol.OTHER_RULES:
+                    print("Table " + str(table) + " plays other rules")
+                elif body[1] == protocol.BAD_RULES:
+                    print("The server does not host " + profile.name + " games")
                 else:
-                    next_button_enabled = True
-
-            else:  # attacker
-                if (len(cards_to_display) > 0 and not_all_cards_defended):
-                    next_button_enabled = True
-                elif (len(cards_to_display) > 0):
-                    end_round_button_enabled = True
-
-    if button == "end_round_button":
-        return end_round_button_enabled
-    elif button == "next_button":
-        return next_button_enabled
+                    print("Table " + str(table) + " is full")
+                connection.closed = True
+        pygame.time.wait(50)
+    connection.close()
+    connection = None
+    return None
+
+
+def receive_views():  # show the states the server sent, returns False once the game is over
+    for body in connection.receive():
+        if body[0] == protocol.VIEW:
+            set_state(protocol.decode_view(body)[1])
+        elif body[0] == protocol.GAME_OVER:
+            if body[1] == protocol.LEFT_RESULT:
+                print("The other player left the game")
+            else:
+                check_win()
+            return False
+        elif body[0] == protocol.REJECTED:
+            print("The server did not accept the move")
+    if connection.closed:
+        print("Lost the connection to the server")
+        return False
+    return True
 
 
-def main():
+def idle_wait(hud):  # ms the loop may block waiting for events, None while something moves
+    if hud.visible or any(player._dragging for player in players):
+        return None
+    if rules.winner(state) is None and isinstance(players[state.turn], ComputerPlayer):
+        return None  # the search result is polled every frame
+    if connection is not None:
+        return NETWORK_POLL
+    return IDLE_WAIT
+
+
+def coalesce_motion(events):  # only the last mouse motion of a frame is handled
+    last = None
+    for i, event in enumerate(events):
+        if event.type == pygame.MOUSEMOTION:
+            last = i
+    return [event for i, event in enumerate(events)
+            if event.type != pygame.MOUSEMOTION or i == last]
+
+
+def show_loading(done, total):  # progress bar while the textures are loaded
+    width, height = screen.get_size()
+    bar = pygame.Rect(0, 0, width // 3, 20)
+    bar.center = (width // 2, height // 2)
+    if done == 1:
+        screen.fill((0, 0, 0))
+        screen.fill((255, 255, 255), bar.inflate(4, 4))
+        screen.fill((0, 0, 0), bar)
+    screen.fill((0, 160, 0), (bar.left, bar.top, bar.width * done // total, bar.height))
+    pygame.display.update(None if done == 1 else bar)
+    pygame.event.pump()  # the window stays responsive
+
+
+def main(vs_computer=False, replay_path=None, server_address=None, table=0, seed=None,
+         profile=rules.CLASSIC, frame_cap=FRAME_CAP):
+    global game_journal
+    global recorder
+    global viewer
+    global connection
 
     # set up screen
     screen_size_x = screen.get_width()
@@ -609,52 +706,149 @@ def main():
     # create quit button
     quit_button_rect = pygame.Rect((screen_size_x - 120, 20, 100, 40))
     font = pygame.font.SysFont(None, 32)
-    quit_text = font.render("Quit", True, (255, 255, 255))
+    quit_text = textures.text_cache.render(
+        font, "Quit", True, (255, 255, 255))
 
     # create next turn button
     next_button_rect = pygame.Rect(
         (screen_size_x - 160, screen_size_y / 2 - 20, 140, 40))
-    next_button_text = font.render("Next turn", True, (255, 255, 255))
+    next_button_text = textures.text_cache.render(
+        font, "Next turn", True, (255, 255, 255))
 
     end_round_button_rect = pygame.Rect(
         (screen_size_x - 160, screen_size_y / 2 + 30, 140, 40))
-    end_round_button_text = font.render("End round", True, (255, 255, 255))
-
-    global defender
-
-    # create deck and players
-    deck = Deck()
-    player1 = Player(deck, "player1", (400, screen_size_y - 250))
-    player1._visible = True
-    player2 = Player(deck, "player2", (400, 100))
-    defender = player2
-
-    player1.deal_hand(6)
-    player2.deal_hand(6)
-
-    # set up background and card stack images
-    background_image = pygame.image.load(
-        "Images\\green-casino-poker-table-texture-game-background-free-vector.jpg")
-    background_image = pygame.transform.scale(
-        background_image, (screen_size_x, screen_size_y))
-    back_of_card = pygame.image.load("Images\\back of the card.jpg")
-    back_of_card = pygame.transform.scale(back_of_card, (100, 150))
-
-    # start game loop
+    end_round_button_text = textures.text_cache.render(
+        font, "End round", True, (255, 255, 255))
+
+    # create deck and players, then deal a new game
+    deck = Deck(seed)
+    if server_address is not None:  # network game, the players are created in seat order
+        joined = join_table(server_address, table, profile)
+        if joined is None:
+            return
+        seat, first_state = joined
+        for i in range(2):
+            if i == seat:  # the local player is always at the bottom
+                Player(deck, "player" + str(i + 1), (400, screen_size_y - 250))
+            else:
+                RemotePlayer(deck, "player" + str(i + 1), (400, 100))
+        player1, player2 = players
+    else:
+        player1 = Player(deck, "player1", (400, screen_size_y - 250))
+        if vs_computer and replay_path is None:
+            player2 = ComputerPlayer(deck, "computer", (400, 100))
+        else:
+            player2 = Player(deck, "player2", (400, 100))
+
+    if server_address is not None:
+        set_state(first_state)
+    elif replay_path is not None:  # show the games of a replay archive
+        try:
+            viewer = ReplayViewer(replay.ReplayArchive(replay_path))
+            viewer.go_to(0)
+        except (OSError, IndexError, replay.ReplayError) as error:
+            print("Can not show the replays in " + replay_path + ": " + str(error))
+            if viewer is not None:
+                viewer.archive.close()
+                viewer = None
+            return
+    else:
+        # continue the game that was running when the program stopped, or deal a new one;
+        # a game asked for by its seed is always dealt
+        recovered = None if seed is not None else journal.recover(JOURNAL_FILE)
+        if recovered is not None and recovered[0].profile is not profile:
+            recovered = None  # the last game had other rules
+        if recovered is not None:
+            snapshot, hands, moves = recovered
+            restore_state(snapshot, hands)
+            for move in moves:
+                apply_move(move)
+        if recovered is None or rules.winner(state) is not None:
+            # the same game as rules.replay_game(deck.seed, moves, profile=profile) gives
+            set_state(rules.new_game(rules.stream(deck.seed, 0), profile))
+            print("Dealt game " + str(deck.seed))
+        else:
+            print("Recovered the last game")
+        game_journal = journal.Journal(JOURNAL_FILE)
+        game_journal.start(state, current_hands())
+        recorder = replay.ReplayWriter(REPLAY_FILE)
+        recorder.begin(state, current_hands())
+
+    # set up background and card stack images, decoded on worker threads or read from
+    # the texture cache while a progress bar is shown
+    background_file = "green-casino-poker-table-texture-game-background-free-vector.jpg"
+    textures.registry.preload(
+        [(textures.card_file(card.rank, card.suit), textures.CARD_SIZE) for card in deck.cards_by_id] +
+        [("back of the card.jpg", textures.CARD_SIZE),
+         (background_file, (screen_size_x, screen_size_y))], show_loading)
+    textures.registry.retain(textures.CARD_SIZE)
+    textures.registry.retain((screen_size_x, screen_size_y))
+    background_image = textures.registry.get(background_file, (screen_size_x, screen_size_y))
+    back_of_card = textures.registry.get(
+        "back of the card.jpg", textures.CARD_SIZE)
+    renderer = DirtyRenderer(screen, background_image)
+    deck_layer = Layer()  # the deck and the trump card, composed when a card is drawn
+
+    def deck_sprites():
+        if (len(deck) > 0):
+            back_of_card_text = textures.text_cache.render(
+                font, str(len(deck)), True, (255, 255, 255))
+            return [(back_of_card, back_of_card.get_rect(topleft=(50, 325))),
+                    (back_of_card_text, back_of_card_text.get_rect(topleft=(85, 295))),
+                    (deck.trump_card.image, deck.trump_card.image.get_rect(topleft=(180, 325)))]
+        elif (len(deck) == 0 and not deck.trump_card_taken):
+            return [(deck.trump_card.image, deck.trump_card.image.get_rect(topleft=(50, 325)))]
+        return []
+    profiler = perf.FrameProfiler()
+    hud = perf.PerfHud(profiler, font)  # P shows or hides the frame timing overlay
+
+    # start game loop, it sleeps until the next event while nothing moves on the screen
     run = True
+    clock = pygame.time.Clock()
 
     while run:
-        events = pygame.event.get()
+        events = []
+        wait = idle_wait(hud)
+        if wait is not None:
+            event = pygame.event.wait(wait)
+            if event.type != pygame.NOEVENT:
+                events.append(event)
+        profiler.begin_frame()
+        events = coalesce_motion(events + pygame.event.get())
 
         for event in events:  # end game
             if event.type == pygame.QUIT:
                 run = False
 
-            if event.type == pygame.KEYDOWN:
+            # the window contents were lost or changed size, redraw everything
+            if event.type in (pygame.VIDEOEXPOSE, pygame.VIDEORESIZE):
+                renderer.invalidate()
+                update_layout()
+
+            if event.type == pygame.KEYDOWN and viewer is not None:
+                viewer.key_pressed(event.key)
+            elif event.type == pygame.KEYDOWN:
+                if connection is not None and event.key in (pygame.K_s, pygame.K_l, pygame.K_h):
+                    print("Saves and hints are not available in network games")
+                    continue
                 if event.key == pygame.K_s:
                     save_data(deck, player1, player2)
                 if event.key == pygame.K_l:
                     load_data(deck, player1, player2)
+                if event.key == pygame.K_h:
+                    show_hint()
+                if event.key == pygame.K_i:  # switch the probes on, or off with a report
+                    if instrument.enabled():
+                        instrument.print_report()
+                        instrument.disable()
+                    else:
+                        instrument.enable()
+                if event.key == pygame.K_p:
+                    hud.toggle()
+                if event.key == pygame.K_t:  # open the trace in chrome://tracing
+                    profiler.save_trace(TRACE_FILE)
+                    print("Saved the last " + str(len(profiler.frames)) +
+                          " frames to " + TRACE_FILE)
 
             if event.type == pygame.MOUSEBUTTONDOWN:  # handle mouse clicks
                 # quit button pressed
@@ -664,140 +858,141 @@ def main():
                 # next turn button pressed
                 elif event.button == 1 and next_button_rect.collidepoint(event.pos):
                     if (is_enabled("next_button")):
-                        player1.toggle_visibility()
-                        player2.toggle_visibility()
+                        apply_move(button_move("next_button"))
 
-                # end round button pressed
+                # end round button pressed: attacker ends the round or defender takes the cards
                 elif event.button == 1 and end_round_button_rect.collidepoint(event.pos):
                     if is_enabled("end_round_button"):
-                        player1.num_cards_in_hand = len(player1._hand)
-                        player2.num_cards_in_hand = len(player2._hand)
-                        # finds player who clicked the button
-                        for i, player in enumerate(players):
-                            if player.is_visible():
-                                button_clicked_by = player
-
-                        # gynejas (zaidejas, nepaspaudes mygtuko) apsigyne / puolejas paspaude mygtuka
-                        if (not isDefender(button_clicked_by)):
-                            if (len(cards_to_display) > 0):  # attacker played cards this round
-                                undefended_cards = [attacker_card for attacker_card in cards_to_display.keys(
-                                ) if cards_to_display[attacker_card] == None]
-                                # all cards have been defended (the button was pressed legally)
-                                if len(undefended_cards) == 0:
-                                    # other player becomes defender
-                                    defender = players[1 -
-                                                       players.index(defender)]
-                                    player1.toggle_visibility()
-                                    player2.toggle_visibility()
-                                    cards_to_display.clear()
-                                    player1.num_cards_played = 0
-                                    player2.num_cards_played = 0
-                                    run = not check_win(deck)
-                                    # check if both players have at least 6 cards in hand
-                                    if (player1.num_cards_in_hand < 6):
-                                        player1.deal_hand(
-                                            6 - player1.num_cards_in_hand)
-                                        player1.num_cards_in_hand = len(
-                                            player1._hand)
-                                    if (player2.num_cards_in_hand < 6):
-                                        player2.deal_hand(
-                                            6 - player2.num_cards_in_hand)
-                                        player2.num_cards_in_hand = len(
-                                            player1._hand)
-
-                        # gynejas (zaidejas, paspaudes mygtuka) paeme kortas / gynejas paspaude mygtuka
-                        else:
-                            undefended_cards = [attacker_card for attacker_card in cards_to_display.keys(
-                            ) if cards_to_display[attacker_card] == None]
-                            # all cards have NOT been defended (the button was pressed legally)
-                            if not len(undefended_cards) == 0:
-                                for attacker_card in cards_to_display.keys():
-                                    defender._hand.append(attacker_card)
-                                for defender_card in cards_to_display.values():
-                                    if defender_card != None:
-                                        defender._hand.append(defender_card)
-                                defender.num_cards_in_hand = len(
-                                    defender._hand)
-                                player1.toggle_visibility()
-                                player2.toggle_visibility()
-                                cards_to_display.clear()
-                                player1.num_cards_played = 0
-                                player2.num_cards_played = 0
-                                run = not check_win(deck)
-                                # check if both players have at least 6 cards in hand
-                                if (player1.num_cards_in_hand < 6):
-                                    player1.deal_hand(
-                                        6 - player1.num_cards_in_hand)
-                                    player1.num_cards_in_hand = len(
-                                        player1._hand)
-                                if (player2.num_cards_in_hand < 6):
-                                    player2.deal_hand(
-                                        6 - player2.num_cards_in_hand)
-                                    player2.num_cards_in_hand = len(
-                                        player1._hand)
-
-            player1.event_handler(event)
-            player2.event_handler(event)
-
-        # draw screen
-        screen.blit(background_image, (0, 0))
-        # pygame.draw.rect(screen, (0, 255, 0), deck_rect)
-        if (len(deck.cards) > 0):
-            screen.blit(back_of_card, (50, 325))
-            back_of_card_text = font.render(
-                str(len(deck.cards)), True, (255, 255, 255))
-            screen.blit(back_of_card_text, (85, 295))
-            deck.trump_card.draw((180, 325))
-        elif (len(deck.cards) == 0 and not deck.trump_card_taken):
-            deck.trump_card.draw((50, 325))
+                        apply_move(button_move("end_round_button"))
+                        run = not check_win()
+
+            if viewer is None:
+                player1.event_handler(event)
+                player2.event_handler(event)
+
+        # moves of both players come back from the server in a network game
+        if run and connection is not None:
+            run = receive_views()
+
+        # the computer moves once its search is done
+        for player in players:
+            if run and isinstance(player, ComputerPlayer) and player.play():
+                run = not check_win()
+        profiler.mark("events")
+
+        # draw screen, only the parts that changed since the last frame are redrawn
+        frame = renderer.begin_frame()
+        # frame.fill((0, 255, 0), deck_rect)
+        deck_layer.draw(frame, (len(deck), deck.trump_card.id, deck.trump_card_taken),
+                        deck_sprites, background_image)
 
         # draw buttons
-        pygame.draw.rect(screen, (255, 0, 0), quit_button_rect)
-        screen.blit(quit_text, (screen_size_x - 110, 30))
+        frame.fill((255, 0, 0), quit_button_rect)
+        frame.blit(quit_text, (screen_size_x - 110, 30))
+        if viewer is not None:
+            frame.blit(textures.text_cache.render(
+                font, viewer.caption(), True, (255, 255, 255)), (50, 30))
+        profiler.mark("deck")
+
+        # the hands first, their layers cover what lies below them with the background
+        for player in players:
+            if player.is_visible():
+                player.draw_hand(frame, background_image)
+        profiler.mark("hands")
 
-        # draw player hand, dragged card and cards played by both players
+        # draw buttons, dragged card and cards played by both players
         for i, player in enumerate(players):
             if player.is_visible():  # this player's turn
 
                 if isDefender(player):  # defender
                     if is_enabled("end_round_button"):  # not all cards defended
-                        end_round_button_text = font.render(
-                            "Take cards", True, (255, 255, 255))
-                        pygame.draw.rect(screen, (0, 0, 255),
-                                         end_round_button_rect)
-                        screen.blit(end_round_button_text, (screen_size_x -
-                                                            150, screen_size_y / 2 + 40))
-                    else:  # all cards defended
-                        pygame.draw.rect(screen, (0, 255, 0), next_button_rect)
-                        screen.blit(next_button_text, (screen_size_x -
-                                                       150, screen_size_y / 2 - 10))
+                        end_round_button_text = textures.text_cache.render(
+                            font, "Take cards", True, (255, 255, 255))
+                        frame.fill((0, 0, 255), end_round_button_rect)
+                        frame.blit(end_round_button_text, (screen_size_x -
+                                                           150, screen_size_y / 2 + 40))
+                    elif is_enabled("next_button"):  # all cards defended
+                        frame.fill((0, 255, 0), next_button_rect)
+                        frame.blit(next_button_text, (screen_size_x -
+                                                      150, screen_size_y / 2 - 10))
 
                 else:  # attacker
                     if is_enabled("next_button"):  # played a card this turn
-                        pygame.draw.rect(screen, (0, 255, 0), next_button_rect)
-                        screen.blit(next_button_text, (screen_size_x -
-                                                       150, screen_size_y / 2 - 10))
+                        frame.fill((0, 255, 0), next_button_rect)
+                        frame.blit(next_button_text, (screen_size_x -
+                                                      150, screen_size_y / 2 - 10))
                     elif is_enabled("end_round_button"):  # all cards defended
-                        end_round_button_text = font.render(
-                            "End round", True, (255, 255, 255))
-                        pygame.draw.rect(screen, (0, 0, 255),
-                                         end_round_button_rect)
-                        screen.blit(end_round_button_text, (screen_size_x -
-                                                            150, screen_size_y / 2 + 40))
-
-                player.draw_hand(
-                    screen, player.hand_position[0], player.hand_position[1])
+                        end_round_button_text = textures.text_cache.render(
+                            font, "End round", True, (255, 255, 255))
+                        frame.fill((0, 0, 255), end_round_button_rect)
+                        frame.blit(end_round_button_text, (screen_size_x -
+                                                           150, screen_size_y / 2 + 40))
+                profiler.mark("rules")
+
                 opponent = players[1-i]
                 player.draw_cards_to_display(
-                    screen, isDefender(player), opponent)
+                    frame, isDefender(player), opponent)
                 player.update()  # update dragged card position
-                player.draw_dragged_card()
-
-        pygame.display.update()
-
+                player.draw_dragged_card(frame)
+                profiler.mark("table")
+
+        hud.draw(frame, (50, 60))
+        renderer.render(frame)
+        profiler.mark("display")
+        profiler.end_frame()
+        clock.tick(frame_cap)  # sleeps what is left of the frame time
+
+    for player in players:
+        if isinstance(player, ComputerPlayer):
+            player.close()
+    if viewer is not None:
+        viewer.archive.close()
+        viewer = None
+    elif connection is not None:  # the server ends the game for the other player
+        connection.close()
+        connection = None
+    elif rules.winner(state) is not None:
+        game_journal.delete()  # nothing to recover from a finished game
+        recorder.finish()
+    else:
+        game_journal.close()
+    game_journal = None
+    recorder = None
+    textures.registry.release(textures.CARD_SIZE)
+    textures.registry.release((screen_size_x, screen_size_y))
     pygame.quit()
 
 
 if __name__ == "__main__":
-    main()
-    unittest.main()
+    # python Durak.py --computer plays against ISMCTS,
+    # python Durak.py --replay replays.dat shows the recorded games,
+    # python Durak.py --connect host:5050 [--table 7] plays against someone else on a server,
+    # python Durak.py --seed 42 deals the game with that number again,
+    # python Durak.py --variant perevodnoy-36 plays other rules, see rules.PROFILES,
+    # python Durak.py --fps 30 draws at most 30 frames per second (0: no limit)
+    replay_path = None
+    if "--replay" in sys.argv[:-1]:
+        replay_path = sys.argv[sys.argv.index("--replay") + 1]
+    server_address = None
+    if "--connect" in sys.argv[:-1]:
+        host, _, port = sys.argv[sys.argv.index("--connect") + 1].rpartition(":")
+        server_address = (host, int(port))
+    table = 0
+    if "--table" in sys.argv[:-1]:
+        table = int(sys.argv[sys.argv.index("--table") + 1])
+    seed = None
+    if "--seed" in sys.argv[:-1]:
+        seed = int(sys.argv[sys.argv.index("--seed") + 1])
+    profile = rules.CLASSIC
+    if "--variant" in sys.argv[:-1]:
+        profile = rules.get_profile(sys.argv[sys.argv.index("--variant") + 1])
+        if profile.players != 2:
+            sys.exit("The game window has two players, " + profile.name + " needs " +
+                     str(profile.players))
+        if "--computer" in sys.argv:
+            sys.exit("The computer only plays the classic rules")
+    frame_cap = FRAME_CAP
+    if "--fps" in sys.argv[:-1]:
+        frame_cap = int(sys.argv[sys.argv.index("--fps") + 1])
+    main("--computer" in sys.argv, replay_path, server_address, table, seed, profile, frame_cap)
+    unittest.main(argv=sys.argv[:1])
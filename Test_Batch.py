@@ -0,0 +1,62 @@
+import unittest
+import rules
+
+try:
+    import numpy
+    import batch
+except ImportError:  # numpy is only needed by the batch engine
+    numpy = None
+
+
+def rules_move(state, action):  # batch action -> rules move
+    if action == batch.PASS:
+        return (rules.PASS, None, None)
+    if action == batch.END_ROUND:
+        return (rules.END_ROUND, None, None)
+    if action == batch.TAKE:
+        return (rules.TAKE, None, None)
+    if state.turn == state.attacker:
+        return (rules.ATTACK, action, None)
+    targets = [attack for attack in state.undefended()
+               if rules.beats(action, attack, state.trump_suit)]
+    return (rules.DEFEND, action, min(targets))
+
+
+def normalized(state):  # table in card order, like BatchGames.state
+    return state._replace(table=tuple(sorted(state.table)))
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestBatchGames(unittest.TestCase):
+    def test_matches_rules(self):
+        games = batch.BatchGames(16, seed=2)
+        states = [games.state(game) for game in range(games.size)]
+        while not games.done.all():
+            legal = games.legal_actions()
+            for game in range(games.size):
+                expected = set() if games.done[game] else \
+                    {rules_move(states[game], action) for action in numpy.flatnonzero(legal[game])}
+                moves = rules.legal_moves(states[game])
+                self.assertTrue(expected <= set(moves))
+                self.assertEqual({rules_move(states[game], action)[1] for action in
+                                  numpy.flatnonzero(legal[game])} if expected else set(),
+                                 {move[1] for move in moves})
+            actions = games.random_actions(legal)
+            games.step(actions)
+            for game in range(games.size):
+                if rules.winner(states[game]) is None:
+                    states[game] = rules.apply(states[game], rules_move(states[game], int(actions[game])))
+                self.assertEqual(games.state(game), normalized(states[game]))
+                if games.done[game]:
+                    self.assertEqual(games.winner[game], rules.winner(states[game]))
+
+    def test_play_random(self):
+        wins, round_lengths, moves = batch.play_random(100, batch_size=32, seed=1)
+        self.assertEqual(sum(wins.values()), 100)
+        self.assertEqual(sum(round_lengths.values()), 100)
+        # every round takes at least an attack and the move that ends it
+        self.assertGreaterEqual(moves, 2 * sum(rounds * count for rounds, count in round_lengths.items()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,19 @@
+import unittest
+import bench
+
+
+class TestBench(unittest.TestCase):
+    def test_compare(self):
+        baseline = {"fast": {"best": 1.0}, "slow": {"best": 1.0}}
+        results = {"fast": {"best": 1.1}, "slow": {"best": 1.5}, "new": {"best": 9.0}}
+        self.assertEqual(bench.compare(results, baseline, 0.25), [("slow", 1.0, 1.5)])
+
+    def test_run(self):
+        results = bench.run_benchmarks("is_enabled", repeat=2)
+        self.assertEqual(list(results), ["is_enabled"])
+        self.assertGreater(results["is_enabled"]["best"], 0)
+        self.assertLessEqual(results["is_enabled"]["best"], results["is_enabled"]["median"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,6 @@
 import unittest
+import Durak
+import rules
 from Durak import Player
 from Durak import Deck
 
@@ -61,5 +63,89 @@ class TestPlayer(unittest.TestCase):
             self.assertIsNone(player2_hand_line)
 
 
+class TestDeck(unittest.TestCase):
+    def test_seeded_deal(self):
+        first = Deck(seed=5)
+        second = Deck(seed=5)
+        self.assertEqual(first.cards, second.cards)
+        self.assertNotEqual(first.cards, Deck(seed=5, stream=1).cards)
+        hand = first.deal_cards(6, [])
+        self.assertEqual(hand, second.cards[1:7])  # the trump card is not dealt
+        self.assertEqual(len(first), 51 - 6)
+        first.deal_cards(100, hand)
+        self.assertEqual(len(first), 0)
+        self.assertEqual(len(hand), 52)  # the trump card comes last
+        self.assertIs(hand[-1], first.trump_card)
+
+    def test_set_cards(self):
+        deck = Deck(seed=5)
+        all_cards = sorted(card.id for card in deck.cards)
+        left = [deck.cards_by_id[card] for card in (7, 3, 40, 12)]
+        deck.set_cards(left)
+        self.assertEqual(sorted(card.id for card in deck.cards), all_cards)
+        self.assertEqual(deck.cards[deck.top:], left)
+        self.assertEqual(len(deck), 4)
+
+
+class TestDropTargets(unittest.TestCase):
+    def test_targets_of_dragged_card(self):
+        Durak.players.clear()
+        deck = Deck(seed=1)
+        Player(deck, "player1", (400, 650))
+        defender = Player(deck, "player2", (400, 100))
+        card = rules.card_id
+        state = rules.GameState(
+            (), card("6", "spades"), True,
+            (rules.mask_of([card("7", "hearts"), card("8", "clubs"), card("9", "clubs")]),
+             rules.mask_of([card("9", "hearts"), card("3", "clubs"), card("5", "clubs")])),
+            ((card("5", "hearts"), None),), 1, 1,
+            profile=rules.get_profile("perevodnoy-52"))
+        Durak.set_state(state)
+        defender._dragged_card = deck.cards_by_id[card("9", "hearts")]
+        defender.find_drop_targets()
+        self.assertEqual(defender._drop_targets, {deck.cards_by_id[card("5", "hearts")]})
+        self.assertIsNone(defender._drop_move)
+        defender._dragged_card = deck.cards_by_id[card("5", "clubs")]
+        defender.find_drop_targets()
+        self.assertEqual(defender._drop_targets, set())
+        self.assertEqual(defender._drop_move, (rules.TRANSFER, card("5", "clubs"), None))
+
+    def test_release_on_hand(self):
+        Durak.players.clear()
+        deck = Deck(seed=1)
+        Player(deck, "player1", (400, 650))
+        defender = Player(deck, "player2", (400, 100))
+        card = rules.card_id
+        state = rules.GameState(
+            (), card("6", "spades"), True,
+            (rules.mask_of([card("7", "hearts"), card("8", "clubs")]),
+             rules.mask_of([card("9", "hearts"), card("5", "clubs")])),
+            ((card("5", "hearts"), None),), 1, 1,
+            profile=rules.get_profile("perevodnoy-52"))
+        Durak.set_state(state)
+        pygame = Durak.pygame
+
+        def drop(pos):
+            defender._dragging = True
+            defender._dragged_card = deck.cards_by_id[card("5", "clubs")]
+            defender.find_drop_targets()
+            defender.event_handler(pygame.event.Event(pygame.MOUSEBUTTONUP, pos=pos, button=1))
+        _, rect = Durak.card_layout.hands[1][0]
+        drop(rect.topleft)  # back on the hand, nothing is played
+        self.assertIs(Durak.state, state)
+        drop((5, Durak.card_layout.table_area.centery))  # on the table, the card is passed on
+        self.assertEqual(Durak.state.table,
+                         ((card("5", "hearts"), None), (card("5", "clubs"), None)))
+
+
+class TestEvents(unittest.TestCase):
+    def test_coalesce_motion(self):
+        pygame = Durak.pygame
+        moves = [pygame.event.Event(pygame.MOUSEMOTION, pos=(x, 0)) for x in range(3)]
+        click = pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(1, 0), button=1)
+        events = Durak.coalesce_motion([moves[0], click, moves[1], moves[2]])
+        self.assertEqual(events, [click, moves[2]])
+
+
 if __name__ == '__main__':
     unittest.main()
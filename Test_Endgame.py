@@ -0,0 +1,62 @@
+import random
+import unittest
+import endgame
+import rules
+
+
+def card(name):  # "10 of hearts" -> card id
+    rank, suit = name.split(" of ")
+    return rules.card_id(rank, suit)
+
+
+def minimax(state):  # plain search over rules, 1 if the player to move wins
+    result = rules.winner(state)
+    if result is not None:
+        return 0 if result == rules.TIE else (1 if result == state.turn else -1)
+    best = -1
+    for move in rules.legal_moves(state):
+        child = rules.apply(state, move)
+        best = max(best, minimax(child) if child.turn == state.turn else -minimax(child))
+    return best
+
+
+class TestEndgame(unittest.TestCase):
+    def test_attacker_wins_with_a_pair(self):
+        # player 0 plays both fives, player 1 can beat neither and is left with the cards
+        state = rules.GameState(
+            (), card("2 of spades"), True,
+            (rules.mask_of([card("5 of hearts"), card("5 of clubs")]),
+             rules.mask_of([card("3 of hearts"), card("4 of clubs")])),
+            (), 1, 0)
+        result, move = endgame.EndgameSolver().solve(state)
+        self.assertEqual(result, 0)
+        self.assertEqual(move[0], rules.ATTACK)
+
+    def test_matches_plain_search(self):
+        rng = random.Random(3)
+        for _ in range(30):
+            cards = rng.sample(range(rules.NUM_CARDS), 7)
+            state = rules.GameState((), cards[0], True, (rules.mask_of(cards[1:4]),
+                                    rules.mask_of(cards[4:])), (), 1, 0)
+            result, move = endgame.EndgameSolver(1 << 8).solve(state)
+            value = minimax(state)
+            expected = rules.TIE if value == 0 else (0 if value == 1 else 1)
+            self.assertEqual(result, expected)
+            self.assertTrue(rules.is_legal(state, move))
+
+    def test_node_limit(self):
+        cards = random.Random(5).sample(range(rules.NUM_CARDS), 17)
+        state = rules.GameState((), cards[0], True, (rules.mask_of(cards[1:9]),
+                                rules.mask_of(cards[9:])), (), 1, 0)
+        with self.assertRaises(endgame.SearchLimit):
+            endgame.EndgameSolver().solve(state, max_nodes=100)
+        with self.assertRaises(endgame.SearchLimit):
+            endgame.EndgameSolver().solve(state, time_limit=0)
+
+    def test_needs_empty_deck(self):
+        with self.assertRaises(ValueError):
+            endgame.solve(rules.new_game(random.Random(1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import instrument
+
+
+@instrument.probe("test.square")
+def square(x):
+    return x * x
+
+
+class TestInstrument(unittest.TestCase):
+    def tearDown(self):
+        instrument.disable("test.*")
+        square.probe.reset()
+
+    def test_disabled(self):
+        self.assertEqual(square(3), 9)
+        self.assertEqual(square.probe.calls, 0)
+
+    def test_sampling(self):
+        instrument.enable("test.*", sample_every=4)
+        for x in range(10):
+            self.assertEqual(square(x), x * x)
+        self.assertEqual(square.probe.calls, 10)
+        self.assertEqual(square.probe.sampled, 3)  # calls 1, 5 and 9
+        self.assertEqual(sum(square.probe.histogram), 3)
+        self.assertIn("test.square", instrument.enabled())
+        self.assertTrue(instrument.report())
+
+    def test_enabled_before_it_exists(self):
+        instrument.enable("test.later")
+
+        @instrument.probe("test.later")
+        def later():
+            pass
+        later()
+        self.assertEqual(later.probe.calls, 1)
+
+    def test_environment(self):
+        instrument.enable_from_environment({"DURAK_PROBES": "test.square",
+                                            "DURAK_PROBE_SAMPLE": "2"})
+        self.assertTrue(square.probe.enabled)
+        self.assertEqual(square.probe.sample_every, 2)
+        instrument.enable_from_environment({"DURAK_PROBES": "test.square",
+                                            "DURAK_PROBE_SAMPLE": "often"})
+        self.assertEqual(square.probe.sample_every, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import random
+import tempfile
+import unittest
+import journal
+import rules
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "journal.dat")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def play(self, num_moves, snapshot_every):  # returns the state after num_moves
+        rng = random.Random(8)
+        state = rules.new_game(rng)
+        game_journal = journal.Journal(self.path, snapshot_every)
+        game_journal.start(state, None)
+        for _ in range(num_moves):
+            move = rng.choice(rules.legal_moves(state))
+            state = rules.apply(state, move)
+            if game_journal.append(move):
+                game_journal.snapshot(state, None)
+        game_journal.close()
+        return state
+
+    def replay(self):
+        snapshot, hands, moves = journal.recover(self.path)
+        for move in moves:
+            snapshot = rules.apply(snapshot, move)
+        return snapshot, moves
+
+    def test_recover(self):
+        state = self.play(50, 16)
+        recovered, moves = self.replay()
+        self.assertEqual(recovered, state)
+        self.assertEqual(len(moves), 50 % 16)
+
+    def test_cut_off_record(self):
+        self.play(10, 64)
+        with open(self.path, "ab") as file:
+            file.write(bytes([journal.MOVE, rules.PASS]))  # crash in the middle of a write
+        recovered, moves = self.replay()
+        self.assertEqual(len(moves), 10)
+
+    def test_no_journal(self):
+        self.assertIsNone(journal.recover(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
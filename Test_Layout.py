@@ -0,0 +1,44 @@
+import unittest
+import layout
+
+
+class TestLayout(unittest.TestCase):
+    def setUp(self):
+        self.layout = layout.Layout()
+        hand = list(range(34))  # a big hand after taking the cards a few times
+        self.layout.update((1600, 900), [(hand, (400, 650)), ([], (400, 100))],
+                           [(40, 41), (42, None)])
+
+    def test_topmost_hand_card(self):
+        for card, rect in self.layout.hands[0]:
+            # the top left corner of a card is never covered by the cards after it
+            self.assertEqual(self.layout.hand_card_at(0, rect.topleft), card)
+        # the middle of the first card is covered by the card two rows down
+        _, rect = self.layout.hands[0][0]
+        self.assertEqual(self.layout.hand_card_at(0, rect.center), 2 * layout.CARDS_PER_ROW)
+        self.assertIsNone(self.layout.hand_card_at(0, (0, 0)))
+        self.assertIsNone(self.layout.hand_card_at(1, rect.topleft))
+
+    def test_table(self):
+        (attack, attack_rect, defense, defense_rect), (_, second_rect, _, _) = self.layout.table
+        self.assertEqual((attack, defense), (40, 41))
+        self.assertEqual(defense_rect.top - attack_rect.top, layout.DEFENSE_OFFSET)
+        self.assertEqual(attack_rect.centerx + second_rect.centerx, 1600)
+        self.assertEqual(self.layout.attack_card_at(second_rect.center), 42)
+        self.assertIsNone(self.layout.attack_card_at((5, 5)))
+        self.assertTrue(self.layout.on_table(0, attack_rect.center))
+        self.assertTrue(self.layout.on_table(1, (5, 450)))
+        _, rect = self.layout.hands[0][0]
+        self.assertFalse(self.layout.on_table(0, rect.topleft))  # back on the hand
+        self.assertFalse(self.layout.on_table(1, (450, 120)))  # on the other hand
+
+    def test_hand_versions(self):
+        versions = self.layout.hand_versions
+        hand = list(range(34))
+        self.layout.update((1600, 900), [(hand, (400, 650)), ([7], (400, 100))], [(40, 41)])
+        self.assertEqual(self.layout.hand_versions[0], versions[0])  # only the table changed
+        self.assertNotEqual(self.layout.hand_versions[1], versions[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import json
+import os
+import tempfile
+import unittest
+import perf
+
+
+class TestPerf(unittest.TestCase):
+    def setUp(self):
+        self.profiler = perf.FrameProfiler(max_frames=10)
+        for _ in range(12):
+            self.profiler.begin_frame()
+            self.profiler.mark("events")
+            self.profiler.mark("display")
+            self.profiler.end_frame()
+
+    def test_frames(self):
+        self.assertEqual(len(self.profiler.frames), 10)  # only the last frames are kept
+        self.assertEqual(self.profiler.fps(), 10)
+        self.assertEqual(set(self.profiler.section_times()), {"events", "display"})
+        self.assertLessEqual(self.profiler.frame_time(0.5), self.profiler.frame_time(0.99))
+
+    def test_trace(self):
+        path = os.path.join(tempfile.mkdtemp(), "trace.json")
+        self.profiler.save_trace(path)
+        with open(path) as file:
+            events = json.load(file)["traceEvents"]
+        os.remove(path)
+        self.assertEqual(len(events), 30)  # every frame and its two sections
+        self.assertTrue(all(event["ph"] == "X" and event["dur"] >= 0 for event in events))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import unittest
+import pygame
+import renderer
+
+
+class TestLayer(unittest.TestCase):
+    def setUp(self):
+        self.background = pygame.Surface((200, 100))
+        self.background.fill((0, 120, 0))
+        self.sprites = []
+        for color, x in (((255, 0, 0), 10), ((0, 0, 255), 30)):  # the second one overlaps
+            sprite = pygame.Surface((40, 60))
+            sprite.fill(color)
+            self.sprites.append((sprite, pygame.Rect((x, 20), sprite.get_size())))
+
+    def test_composed_once_per_key(self):
+        layer = renderer.Layer()
+        calls = []
+
+        def sprites():
+            calls.append(1)
+            return self.sprites
+        scene = renderer.Scene((200, 100))
+        for key in (1, 1, 2):
+            layer.draw(scene, key, sprites, self.background)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual([rect for _, rect in scene.items], [pygame.Rect(10, 20, 60, 60)] * 3)
+
+    def test_same_pixels_as_direct_blits(self):
+        direct = self.background.copy()
+        for sprite, rect in self.sprites:
+            direct.blit(sprite, rect)
+        layered = self.background.copy()
+        renderer.Layer().draw(layered, 1, lambda: self.sprites, self.background)
+        self.assertEqual(pygame.image.tobytes(layered, "RGB"), pygame.image.tobytes(direct, "RGB"))
+
+
+class TestDirtyRenderer(unittest.TestCase):
+    def setUp(self):
+        if pygame.display.get_surface() is None:  # render() updates the display
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            pygame.display.init()
+            pygame.display.set_mode((200, 100))
+        self.screen = pygame.Surface((200, 100))
+        self.renderer = renderer.DirtyRenderer(self.screen, pygame.Surface((200, 100)))
+        self.sprite = pygame.Surface((20, 10))
+
+    def frame(self, *positions):
+        scene = self.renderer.begin_frame()
+        for pos in positions:
+            scene.blit(self.sprite, pos)
+        return self.renderer.render(scene)
+
+    def test_moved_sprite(self):
+        self.assertEqual(self.frame((10, 10), (150, 50)), [self.screen.get_rect()])
+        self.assertEqual(self.frame((10, 10), (150, 50)), [])  # nothing changed
+        # the old and the new place, joined because they overlap
+        self.assertEqual(self.frame((15, 10), (150, 50)), [pygame.Rect(10, 10, 25, 10)])
+        self.assertEqual(sorted(self.frame((15, 10), (100, 80))),
+                         [pygame.Rect(100, 80, 20, 10), pygame.Rect(150, 50, 20, 10)])
+
+    def test_full_redraw_above_threshold(self):
+        self.sprite = pygame.Surface((150, 80))  # 60% of the screen
+        self.frame((0, 0))
+        self.assertEqual(self.frame((0, 10)), [self.screen.get_rect()])
+        self.sprite = pygame.Surface((20, 10))
+        self.frame((0, 0))
+        self.assertEqual(self.frame((0, 0), (50, 50)), [pygame.Rect(50, 50, 20, 10)])
+        self.renderer.invalidate()
+        self.assertEqual(self.frame((0, 0), (50, 50)), [self.screen.get_rect()])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import random
+import tempfile
+import unittest
+import replay
+import rules
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "replays.dat")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_seek(self):
+        rng = random.Random(9)
+        writer = replay.ReplayWriter(self.path, keyframe_every=8)
+        games = []
+        for _ in range(3):
+            state = rules.new_game(rng)
+            states = [state]
+            writer.begin(state, None)
+            while rules.winner(state) is None:
+                move = rng.choice(rules.legal_moves(state))
+                state = rules.apply(state, move)
+                states.append(state)
+                if writer.record(move):
+                    writer.keyframe(state, None)
+            writer.finish()
+            games.append(states)
+
+        archive = replay.ReplayArchive(self.path)
+        self.assertEqual(len(archive), 3)
+        for index in (2, 0, 1):  # games are found in any order
+            game = archive.game(index)
+            states = games[index]
+            self.assertEqual(game.num_moves, len(states) - 1)
+            for move in (0, 7, 8, 9, len(states) // 2, len(states) - 1):
+                self.assertEqual(game.state_at(move), states[move])
+        with self.assertRaises(IndexError):
+            archive.game(3)
+        archive.close()
+
+    def test_not_an_archive(self):
+        with open(self.path, "wb") as file:
+            file.write(b"cards = [None]\n")
+        with self.assertRaises(replay.ReplayError):
+            replay.ReplayArchive(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+import random
+import unittest
+import rules
+
+
+def card(name):  # "10 of hearts" -> card id
+    rank, suit = name.split(" of ")
+    return rules.card_id(rank, suit)
+
+
+class TestRules(unittest.TestCase):
+    def setUp(self):
+        self.state = rules.new_game(random.Random(1))
+
+    def test_new_game(self):
+        self.assertEqual(rules.count(self.state.hands[0]), rules.HAND_SIZE)
+        self.assertEqual(rules.count(self.state.hands[1]), rules.HAND_SIZE)
+        self.assertEqual(len(self.state.deck), rules.NUM_CARDS - 13)
+        self.assertEqual(self.state.defender, 1)
+        self.assertEqual(self.state.turn, 0)
+        all_cards = list(self.state.deck) + [self.state.trump] + \
+            list(rules.cards_of(self.state.hands[0] | self.state.hands[1]))
+        self.assertEqual(sorted(all_cards), list(range(rules.NUM_CARDS)))
+        self.assertEqual(self.state.unseen(0), rules.FULL_MASK & ~(
+            self.state.hands[0] | 1 << self.state.trump))
+
+    def test_beats(self):
+        spades = rules.SUITS.index("spades")
+        self.assertTrue(rules.beats(card("K of hearts"), card("Q of hearts"), spades))
+        self.assertFalse(rules.beats(card("J of hearts"), card("Q of hearts"), spades))
+        self.assertTrue(rules.beats(card("2 of spades"), card("A of hearts"), spades))
+        self.assertFalse(rules.beats(card("A of clubs"), card("2 of hearts"), spades))
+
+    def test_round(self):
+        state = rules.GameState(
+            (), card("2 of spades"), True,
+            (rules.mask_of([card("5 of hearts"), card("5 of clubs")]),
+             rules.mask_of([card("9 of hearts"), card("3 of clubs")])),
+            (), 1, 0)
+        state = rules.apply(state, (rules.ATTACK, card("5 of hearts"), None))
+        self.assertFalse(rules.is_legal(state, (rules.END_ROUND, None, None)))
+        state = rules.apply(state, (rules.PASS, None, None))
+        self.assertNotIn((rules.DEFEND, card("3 of clubs"), card("5 of hearts")),
+                         rules.legal_moves(state))
+        state = rules.apply(state, (rules.DEFEND, card("9 of hearts"), card("5 of hearts")))
+        state = rules.apply(state, (rules.PASS, None, None))
+        state = rules.apply(state, (rules.ATTACK, card("5 of clubs"), None))  # throw-in
+        state = rules.apply(state, (rules.PASS, None, None))
+        state, result = rules.step(state, (rules.TAKE, None, None))
+        self.assertEqual(result, 0)
+        self.assertEqual(state.hands[1], rules.mask_of([
+            card("3 of clubs"), card("5 of hearts"), card("5 of clubs"), card("9 of hearts")]))
+
+    def test_beats_matrix(self):
+        hearts = rules.SUITS.index("hearts")
+        for trump_suit in range(len(rules.SUITS)):
+            for attack in range(rules.NUM_CARDS):
+                expected = rules.mask_of(
+                    c for c in range(rules.NUM_CARDS)
+                    if (rules.suit_of(c) == rules.suit_of(attack) and rules.rank_of(c) > rules.rank_of(attack))
+                    or (rules.suit_of(c) == trump_suit and rules.suit_of(attack) != trump_suit))
+                self.assertEqual(rules.BEATS[trump_suit][attack], expected)
+        self.assertEqual(rules.count(rules.SUIT_MASKS[hearts]), len(rules.RANKS))
+
+    def test_illegal_move(self):
+        attack = next(rules.cards_of(self.state.hands[1]))
+        with self.assertRaises(ValueError):
+            rules.apply(self.state, (rules.ATTACK, attack, None))
+
+    def test_random_games_end(self):
+        rng = random.Random(7)
+        for _ in range(50):
+            state = rules.new_game(rng)
+            while rules.winner(state) is None:
+                state = rules.apply(state, rng.choice(rules.legal_moves(state)))
+            self.assertEqual(rules.legal_moves(state), [])
+
+    def test_round_status(self):
+        rng = random.Random(11)
+        for _ in range(20):
+            state = rules.new_game(rng)
+            status = rules.RoundStatus(state)
+            while True:
+                fresh = rules.RoundStatus(state)
+                self.assertEqual((status.played, status.defended, status.turn, status.defender,
+                                  status.result),
+                                 (fresh.played, fresh.defended, fresh.turn, fresh.defender,
+                                  fresh.result))
+                for kind in (rules.PASS, rules.END_ROUND, rules.TAKE):
+                    self.assertEqual(status.allows(kind), rules.is_legal(state, (kind, None, None)))
+                moves = rules.legal_moves(state)
+                if not moves:
+                    break
+                move = rng.choice(moves)
+                state = rules.apply(state, move)
+                status.update(move, state)
+
+    def test_replay_game(self):
+        rng = random.Random(3)
+        state = rules.new_game(rules.stream(9, 2))
+        moves = []
+        while rules.winner(state) is None:
+            moves.append(rng.choice(rules.legal_moves(state)))
+            state = rules.apply(state, moves[-1])
+        self.assertEqual(rules.replay_game(9, moves, 2), state)
+        self.assertNotEqual(rules.new_game(rules.stream(9, 1)), rules.new_game(rules.stream(9, 2)))
+        profile = rules.get_profile("perevodnoy-36")
+        state = rules.new_game(rules.stream(9, 0), profile)
+        moves = []
+        while rules.winner(state) is None:
+            moves.append(rng.choice(rules.legal_moves(state)))
+            state = rules.apply(state, moves[-1])
+        self.assertEqual(rules.replay_game(9, moves, profile=profile), state)
+
+
+class TestProfiles(unittest.TestCase):
+    def test_short_deck(self):
+        profile = rules.get_profile("podkidnoy-36")
+        state = rules.new_game(random.Random(1), profile)
+        all_cards = list(state.deck) + [state.trump] + \
+            list(rules.cards_of(state.hands[0] | state.hands[1]))
+        self.assertEqual(sorted(all_cards), list(range(rules.card_id("6", rules.SUITS[0]),
+                                                       rules.NUM_CARDS)))
+        self.assertEqual(profile.beats[state.trump_suit][card("7 of hearts")] &
+                         ~profile.deck_mask, 0)
+        with self.assertRaises(ValueError):
+            rules.Profile("too many", players=7)
+
+    def test_transfer(self):
+        profile = rules.get_profile("perevodnoy-36")
+        state = rules.GameState(
+            (), card("6 of spades"), True,
+            (rules.mask_of([card("7 of hearts"), card("8 of clubs"), card("9 of clubs")]),
+             rules.mask_of([card("7 of clubs"), card("K of hearts")])),
+            (), 1, 0, profile=profile)
+        state = rules.apply(state, (rules.ATTACK, card("7 of hearts"), None))
+        state = rules.apply(state, (rules.PASS, None, None))
+        self.assertIn((rules.TRANSFER, card("7 of clubs"), None), rules.legal_moves(state))
+        state = rules.apply(state, (rules.TRANSFER, card("7 of clubs"), None))
+        self.assertEqual((state.defender, state.turn), (0, 0))  # the attacker defends now
+        self.assertEqual(len(state.undefended()), 2)
+        # the player who transferred can not get more cards than they hold
+        self.assertFalse(rules.is_legal(state, (rules.TRANSFER, card("8 of clubs"), None)))
+
+    def test_defender_hand_limit(self):
+        profile = rules.get_profile("podkidnoy-36")
+        state = rules.GameState(
+            (), card("6 of spades"), True,
+            (rules.mask_of([card("7 of hearts"), card("7 of clubs")]),
+             rules.mask_of([card("K of diamonds")])),
+            (), 1, 0, profile=profile)
+        state = rules.apply(state, (rules.ATTACK, card("7 of hearts"), None))
+        self.assertFalse(rules.is_legal(state, (rules.ATTACK, card("7 of clubs"), None)))
+
+    def test_random_games_of_every_profile(self):
+        rng = random.Random(5)
+        for profile in rules.PROFILES:
+            for _ in range(10):
+                state = rules.new_game(rng, profile)
+                status = rules.RoundStatus(state)
+                while True:
+                    in_play = state.discard | state.table_mask() | rules.mask_of(state.deck)
+                    for hand in state.hands:
+                        in_play |= hand
+                    if not state.trump_taken:
+                        in_play |= 1 << state.trump
+                    self.assertEqual(in_play, profile.deck_mask)
+                    for kind in (rules.PASS, rules.END_ROUND, rules.TAKE):
+                        self.assertEqual(status.allows(kind),
+                                         rules.is_legal(state, (kind, None, None)))
+                    moves = rules.legal_moves(state)
+                    if not moves:
+                        break
+                    move = rng.choice(moves)
+                    state = rules.apply(state, move)
+                    status.update(move, state)
+                self.assertIsNotNone(rules.loser(state))
+
+
+if __name__ == '__main__':
+    unittest.main()
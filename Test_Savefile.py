@@ -0,0 +1,47 @@
+import os
+import random
+import tempfile
+import unittest
+import rules
+import savefile
+
+
+class TestSavefile(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(6)
+        self.state = rules.new_game(rng)
+        for _ in range(30):  # some cards on the table and in the discard pile
+            self.state = rules.apply(self.state, rng.choice(rules.legal_moves(self.state)))
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "save_data.dat")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        hands = [sorted(rules.cards_of(hand), reverse=True) for hand in self.state.hands]
+        savefile.save(self.path, self.state, hands)
+        state, loaded_hands = savefile.load(self.path)
+        self.assertEqual(state, self.state)
+        self.assertEqual([list(hand) for hand in loaded_hands], hands)
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+
+    def test_damaged_file(self):
+        data = bytearray(savefile.encode(self.state))
+        data[savefile.HEADER.size] ^= 1
+        with self.assertRaises(savefile.SaveError):
+            savefile.decode(bytes(data))
+        with self.assertRaises(savefile.SaveError):
+            savefile.decode(b"cards = [None]\n")
+
+    def test_convert_text_save(self):
+        savefile.convert("save_data.txt", self.path)
+        state, hands = savefile.load(self.path)
+        self.assertEqual(len(state.deck), 37)
+        self.assertEqual(rules.card_name(state.trump), "10 of spades")
+        self.assertEqual(rules.card_name(hands[0][0]), "4 of spades")
+        self.assertEqual((state.defender, state.turn, state.table), (0, 1, ()))
+
+
+if __name__ == '__main__':
+    unittest.main()
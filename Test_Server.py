@@ -0,0 +1,98 @@
+import asyncio
+import random
+import unittest
+import protocol
+import rules
+import server
+
+
+async def read(reader):
+    length, = protocol.LENGTH.unpack(await reader.readexactly(protocol.LENGTH.size))
+    return await reader.readexactly(length)
+
+
+async def play(port, rng, profile=rules.CLASSIC):
+    # plays random moves until the game is over, returns the result
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(protocol.encode_join(0, profile))
+    while True:
+        body = await read(reader)
+        if body[0] == protocol.GAME_OVER:
+            writer.close()
+            return body[1]
+        if body[0] == protocol.VIEW:
+            seat, state = protocol.decode_view(body)
+            assert state.profile is profile
+            if state.turn == seat and rules.winner(state) is None:
+                writer.write(protocol.encode_move(rng.choice(rules.legal_moves(state))))
+
+
+class TestServer(unittest.TestCase):
+    def test_view(self):
+        state = rules.new_game(random.Random(4))
+        state = rules.apply(state, rules.legal_moves(state)[0])
+        seat, view = protocol.decode_view(protocol.encode_view(state, 1)[2:])
+        self.assertEqual(seat, 1)
+        self.assertEqual(view.hands[1], state.hands[1])
+        self.assertEqual(view.table, state.table)
+        self.assertEqual(len(view.deck), len(state.deck))
+        self.assertEqual(rules.count(view.hands[0]), rules.count(state.hands[0]))
+        self.assertEqual(rules.legal_moves(view), rules.legal_moves(state))
+
+    def test_games(self):
+        async def games():
+            game_server = server.GameServer(seed=1)
+            listener = await game_server.serve("127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+            results = await asyncio.gather(*(play(port, random.Random(i)) for i in range(8)))
+            listener.close()
+            return game_server, results
+        game_server, results = asyncio.run(games())
+        self.assertEqual(len(game_server.tables), 0)
+        self.assertGreater(game_server.moves, 0)
+        self.assertNotIn(protocol.LEFT_RESULT, results)
+
+    def test_variants(self):
+        async def games():
+            listener = await server.GameServer(seed=2).serve("127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+            perevodnoy = rules.get_profile("perevodnoy-36")
+            results = await asyncio.gather(*(play(port, random.Random(i), profile) for i, profile
+                                              in enumerate([perevodnoy, rules.CLASSIC] * 2)))
+            first = await asyncio.open_connection("127.0.0.1", port)
+            second = await asyncio.open_connection("127.0.0.1", port)
+            first[1].write(protocol.encode_join(7))
+            await read(first[0])  # SEATED
+            second[1].write(protocol.encode_join(7, perevodnoy))
+            rejected_body = await read(second[0])
+            listener.close()
+            return results, rejected_body
+        results, rejected_body = asyncio.run(games())
+        self.assertNotIn(protocol.LEFT_RESULT, results)
+        self.assertEqual(rejected_body[1], protocol.OTHER_RULES)
+
+    def test_rejected(self):
+        async def rejected():
+            listener = await server.GameServer().serve("127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+            first = await asyncio.open_connection("127.0.0.1", port)
+            second = await asyncio.open_connection("127.0.0.1", port)
+            for _, writer in (first, second):
+                writer.write(protocol.encode_join(7))
+            for reader, _ in (first, second):
+                await read(reader)  # SEATED
+                seat, state = protocol.decode_view(await read(reader))
+            waiting = second if state.turn != seat else first
+            waiting[1].write(protocol.encode_move((rules.TAKE, None, None)))
+            rejected_body = await read(waiting[0])
+            first[1].close()  # the other player is told
+            left = await read(second[0])
+            listener.close()
+            return rejected_body, left
+        rejected_body, left = asyncio.run(rejected())
+        self.assertEqual(rejected_body[1], protocol.NOT_YOUR_TURN)
+        self.assertEqual(left[1], protocol.LEFT_RESULT)
+
+
+if __name__ == '__main__':
+    unittest.main()
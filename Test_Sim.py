@@ -0,0 +1,47 @@
+import unittest
+import random
+import durak_sim
+import ismcts
+import rules
+import strategies
+
+
+class TestSimulator(unittest.TestCase):
+    def test_same_seed_same_results(self):
+        first = durak_sim.simulate(["greedy", "random"], 50, seed=3)
+        second = durak_sim.simulate(["greedy", "random"], 50, seed=3)
+        self.assertEqual(first["wins"], second["wins"])
+        self.assertEqual(first["round_lengths"], second["round_lengths"])
+        self.assertEqual(sum(first["wins"]) + first["ties"], 50)
+
+    def test_strategies_play_legal_moves(self):
+        state = rules.new_game(durak_sim.stream(0, 0))
+        for name in strategies.STRATEGIES:
+            player = strategies.create(name)
+            player.start_game(state.turn)
+            moves = rules.legal_moves(state)
+            self.assertIn(player.choose_move(state, moves), moves)
+        with self.assertRaises(ValueError):
+            strategies.create("no such strategy")
+
+    def test_determinize_keeps_what_the_player_sees(self):
+        rng = random.Random(4)
+        state = rules.new_game(rng)
+        known = 1 << next(rules.cards_of(state.hands[1]))  # one card of the opponent
+        for _ in range(20):
+            game = ismcts.determinize(state, 0, known, rng)
+            self.assertEqual(game.hands[0], state.hands[0])
+            self.assertEqual(rules.count(game.hands[1]), rules.count(state.hands[1]))
+            self.assertTrue(game.hands[1] & known)
+            self.assertEqual(len(game.deck), len(state.deck))
+            self.assertEqual(game.hands[1] | rules.mask_of(game.deck),
+                             state.hands[1] | rules.mask_of(state.deck))
+
+    def test_ismcts_chooses_legal_move(self):
+        state = rules.new_game(random.Random(2))
+        search = ismcts.ISMCTS(time_budget=None, workers=0, iterations=50, seed=1)
+        self.assertIn(search.choose_move(state, state.turn), rules.legal_moves(state))
+
+
+if __name__ == '__main__':
+    unittest.main()
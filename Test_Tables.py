@@ -0,0 +1,36 @@
+import random
+import unittest
+import rules
+from tables import Table, TableRegistry
+
+
+class TestTables(unittest.TestCase):
+    def setUp(self):
+        self.registry = TableRegistry(idle_after=10)
+        self.tables = [Table(number) for number in range(1, 4)]
+        for table in self.tables:
+            table.state = rules.new_game(random.Random(table.number))
+            self.registry.add(table)
+            self.registry.touch(table, now=table.number)
+
+    def test_evict_least_recently_used(self):
+        self.registry.touch(self.tables[0], now=5)
+        self.assertEqual(self.registry.evict_idle(now=13.5), 2)  # tables 2 and 3
+        self.assertEqual([table.evicted for table in self.tables], [False, True, True])
+        self.assertEqual(self.registry.evict_idle(now=13.5), 0)
+        self.assertEqual(len(self.registry), 3)
+
+    def test_restore_on_demand(self):
+        table = self.tables[1]
+        state = rules.apply(table.state, rules.legal_moves(table.state)[0])
+        table.state = state
+        self.registry.evict_idle(now=100)
+        self.assertTrue(table.evicted)
+        self.assertEqual(table.state, state)
+        self.assertFalse(table.evicted)
+        self.registry.remove(table)
+        self.assertNotIn(table.number, self.registry)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pygame
+import textures
+
+
+class TestTextureCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_preload_from_cache(self):
+        wanted = [(textures.card_file("A", "spades"), textures.CARD_SIZE),
+                  ("back of the card.jpg", (50, 75))]
+        progress = []
+        cold = textures.TextureRegistry(cache_dir=self.cache_dir)
+        cold.preload(wanted, lambda done, total: progress.append((done, total)))
+        self.assertEqual(progress, [(1, 2), (2, 2)])
+        self.assertEqual(cold.cache_hits, 0)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+        warm = textures.TextureRegistry(cache_dir=self.cache_dir)
+        warm.preload(wanted)
+        self.assertEqual(warm.cache_hits, 2)
+        for file_name, size in wanted:
+            self.assertEqual(warm.get(file_name, size).get_size(), size)
+            self.assertEqual(pygame.image.tobytes(warm.get(file_name, size), "RGBA"),
+                             pygame.image.tobytes(cold.get(file_name, size), "RGBA"))
+
+
+class TestTextureRegistry(unittest.TestCase):
+    def test_release_evicts(self):
+        registry = textures.TextureRegistry(cache_dir=None)
+        file_name = textures.card_file("A", "spades")
+        registry.retain((50, 75))
+        registry.retain((50, 75))
+        registry.retain(textures.CARD_SIZE)
+        small = registry.get(file_name, (50, 75))
+        big = registry.get(file_name, textures.CARD_SIZE)
+        registry.release((50, 75))  # still used once
+        self.assertIs(registry.get(file_name, (50, 75)), small)
+        registry.release((50, 75))
+        self.assertIsNot(registry.get(file_name, (50, 75)), small)
+        self.assertIs(registry.get(file_name, textures.CARD_SIZE), big)  # retained size stays
+
+
+class TestTextCache(unittest.TestCase):
+    def test_counters_and_eviction(self):
+        pygame.font.init()
+        font = pygame.font.Font(None, 20)
+        cache = textures.TextCache(max_size=2)
+        first = cache.render(font, "one", True, (255, 255, 255))
+        self.assertIs(cache.render(font, "one", True, (255, 255, 255)), first)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.render(font, "two", True, (255, 255, 255))
+        cache.render(font, "one", True, (255, 255, 255))  # now "two" is the oldest
+        cache.render(font, "three", True, (255, 255, 255))
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+        self.assertIs(cache.render(font, "one", True, (255, 255, 255)), first)
+        cache.render(font, "two", True, (255, 255, 255))  # was evicted
+        self.assertEqual((cache.hits, cache.misses), (3, 4))
+        cache.reset_counters()
+        self.assertEqual((cache.hits, cache.misses), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
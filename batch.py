@@ -0,0 +1,256 @@
+from collections import Counter
+import numpy as np
+import rules
+
+# many games at once as NumPy arrays, every call to step() advances all of them by
+# one action. Card sets are uint64 masks with the same bits as in rules.
+#
+# actions: 0..51 play the card (attack, throw in or defend), PASS, END_ROUND, TAKE.
+# A defending card always beats the lowest undefended attack card it can beat.
+
+PASS = rules.NUM_CARDS
+END_ROUND = rules.NUM_CARDS + 1
+TAKE = rules.NUM_CARDS + 2
+NUM_ACTIONS = rules.NUM_CARDS + 3
+DECK_SIZE = rules.NUM_CARDS - 1  # cards under the trump card
+
+BITS = np.uint64(1) << np.arange(rules.NUM_CARDS, dtype=np.uint64)
+FULL_MASK = np.uint64(rules.FULL_MASK)
+SUIT_MASKS = np.array(rules.SUIT_MASKS, dtype=np.uint64)
+LOWEST_SUIT = SUIT_MASKS[0]  # one bit per rank
+# [trump suit, card] -> attack cards the card beats
+BEATEN_BY = np.array([[rules.mask_of(attack for attack in range(rules.NUM_CARDS)
+                                     if rules.BEATS[trump_suit][attack] >> card & 1)
+                       for card in range(rules.NUM_CARDS)]
+                      for trump_suit in range(len(rules.SUITS))], dtype=np.uint64)
+_POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.int8)
+_ZERO = np.uint64(0)
+_ONE = np.uint64(1)
+
+
+def popcount(masks):  # number of cards in every mask
+    masks = np.ascontiguousarray(masks, dtype=np.uint64)
+    return _POPCOUNT[masks.view(np.uint8)].reshape(masks.shape + (8,)).sum(axis=-1)
+
+
+def to_bits(masks):  # (..., NUM_CARDS) booleans, True where the card is in the mask
+    masks = np.ascontiguousarray(masks, dtype=np.uint64)
+    bits = np.unpackbits(masks.view(np.uint8).reshape(masks.shape + (8,)), axis=-1,
+                         bitorder="little")  # assumes a little-endian machine like the view
+    return bits[..., :rules.NUM_CARDS].view(bool)
+
+
+def same_rank(masks):  # every card sharing a rank with a card in the mask
+    ranks = (masks | masks >> np.uint64(1) | masks >> np.uint64(2) | masks >> np.uint64(3)) & LOWEST_SUIT
+    return ranks | ranks << np.uint64(1) | ranks << np.uint64(2) | ranks << np.uint64(3)
+
+
+def higher_same_suit(masks):  # every card of the same suit and higher rank than a card in the mask
+    step = np.uint64(len(rules.SUITS))
+    higher = masks << step
+    for shift in (1, 2, 4, 8):  # spreads the bits up to 16 ranks up each suit
+        higher |= higher << (step * np.uint64(shift))
+    return higher & FULL_MASK
+
+
+def lowest_card(masks):  # id of the lowest card of every non-empty mask
+    lowest = masks & (~masks + _ONE)
+    return np.log2(lowest.astype(np.float64)).astype(np.intp)
+
+
+class BatchGames:
+    def __init__(self, size, seed=None):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self._index = np.arange(size)
+
+        self.deck = np.zeros((size, DECK_SIZE), dtype=np.int8)  # drawn from column 0
+        self.cursor = np.zeros(size, dtype=np.int8)  # cards drawn from the deck
+        self.trump = np.zeros(size, dtype=np.int8)
+        self.trump_taken = np.zeros(size, dtype=bool)
+        self.hands = np.zeros((size, 2), dtype=np.uint64)
+        self.attack = np.zeros(size, dtype=np.uint64)  # attack cards on the table
+        self.defended = np.zeros(size, dtype=np.uint64)  # attack cards already beaten
+        self.defense = np.zeros(size, dtype=np.uint64)  # cards that beat them
+        self.slots = np.full((size, rules.NUM_CARDS), -1, dtype=np.int8)  # attack -> defense
+        self.discard = np.zeros(size, dtype=np.uint64)
+        self.defender = np.zeros(size, dtype=np.int8)
+        self.turn = np.zeros(size, dtype=np.int8)
+        self.rounds = np.zeros(size, dtype=np.int16)
+        self.done = np.zeros(size, dtype=bool)
+        self.winner = np.zeros(size, dtype=np.int8)  # valid where done, rules.TIE for a tie
+
+        self.reset()
+
+    def reset(self, games=None):  # deal new games (all of them or where games is True)
+        if games is None:
+            games = np.ones(self.size, dtype=bool)
+        count = int(games.sum())
+        if count == 0:
+            return
+        order = np.argsort(self.rng.random((count, rules.NUM_CARDS)), axis=1).astype(np.int8)
+        self.trump[games] = order[:, 0]
+        self.deck[games] = order[:, 1:]
+        self.cursor[games] = 0
+        self.trump_taken[games] = False
+        self.hands[games] = 0
+        self._clear_table(games)
+        self.discard[games] = 0
+        self.defender[games] = 1
+        self.turn[games] = 0
+        self.rounds[games] = 0
+        self.done[games] = False
+        self.winner[games] = 0
+        self._refill(games)
+
+    def _clear_table(self, games):
+        self.attack[games] = 0
+        self.defended[games] = 0
+        self.defense[games] = 0
+        self.slots[games] = -1
+
+    def _deck_empty(self):
+        return (self.cursor >= DECK_SIZE) & self.trump_taken
+
+    def _refill(self, games):  # both players draw up to HAND_SIZE cards, one card at a time
+        for player in range(2):
+            drawing = np.flatnonzero(games)
+            missing = rules.HAND_SIZE - popcount(self.hands[drawing, player])
+            for _ in range(rules.HAND_SIZE):
+                keep = (missing > 0) & ~self._deck_empty()[drawing]
+                drawing, missing = drawing[keep], missing[keep]
+                if drawing.size == 0:
+                    break
+                cursor = self.cursor[drawing]
+                from_deck = cursor < DECK_SIZE  # otherwise the trump card is drawn
+                card = np.where(from_deck, self.deck[drawing, np.minimum(cursor, DECK_SIZE - 1)],
+                                self.trump[drawing])
+                self.hands[drawing, player] |= BITS[card]
+                self.trump_taken[drawing[~from_deck]] = True
+                self.cursor[drawing] += from_deck
+                missing -= 1
+
+    def legal_actions(self):  # (size, NUM_ACTIONS) booleans
+        legal = np.zeros((self.size, NUM_ACTIONS), dtype=bool)
+        attacking = ~self.done & (self.turn != self.defender)
+        defending = ~self.done & (self.turn == self.defender)
+        undefended = self.attack & ~self.defended
+        table_empty = self.attack == 0
+        hand = self.hands[self._index, self.turn]
+
+        # attacker: any card on an empty table, otherwise only ranks already on the table
+        attack_cards = hand & np.where(table_empty, FULL_MASK,
+                                       same_rank(self.attack | self.defense))
+
+        # defender: a higher card of the suit of an undefended card or a trump against
+        # an undefended card of another suit
+        trumps = SUIT_MASKS[self.trump % len(rules.SUITS)]
+        defend_cards = hand & (higher_same_suit(undefended) |
+                               np.where(undefended & ~trumps != 0, trumps, _ZERO))
+
+        cards = np.where(attacking, attack_cards, np.where(defending, defend_cards, _ZERO))
+        legal[:, :rules.NUM_CARDS] = to_bits(cards)
+        legal[:, PASS] = (attacking & (undefended != 0)) | \
+            (defending & ~table_empty & (undefended == 0))
+        legal[:, END_ROUND] = attacking & ~table_empty & (undefended == 0)
+        legal[:, TAKE] = defending & (undefended != 0)
+        return legal
+
+    def random_actions(self, legal=None):  # a uniformly random legal action for every game
+        if legal is None:
+            legal = self.legal_actions()
+        counts = legal.sum(axis=1)
+        choice = (self.rng.random(self.size) * counts).astype(np.intp)  # pick the choice-th
+        return (np.cumsum(legal, axis=1, dtype=np.int8) > choice[:, None]).argmax(axis=1)
+
+    def step(self, actions, validate=True):  # games that are done ignore their action
+        actions = np.asarray(actions)
+        active = ~self.done
+        if validate and not self.legal_actions()[self._index, actions][active].all():
+            raise ValueError("Illegal action")
+
+        attacking = self.turn != self.defender
+        card = np.minimum(actions, rules.NUM_CARDS - 1)
+        bit = BITS[card]
+        plays = active & (actions < rules.NUM_CARDS)
+        turn = self.turn.astype(np.intp)
+
+        # attack or throw in
+        attacks = plays & attacking
+        self.hands[self._index[attacks], turn[attacks]] &= ~bit[attacks]
+        self.attack[attacks] |= bit[attacks]
+
+        # defend the lowest undefended attack card the played card beats
+        defends = plays & ~attacking
+        if defends.any():
+            games = self._index[defends]
+            targets = self.attack[games] & ~self.defended[games] & \
+                BEATEN_BY[self.trump[games] % len(rules.SUITS), card[games]]
+            target = lowest_card(targets)
+            self.hands[games, turn[games]] &= ~bit[games]
+            self.defended[games] |= BITS[target]
+            self.defense[games] |= bit[games]
+            self.slots[games, target] = card[games]
+
+        passes = active & (actions == PASS)
+        self.turn[passes] = 1 - self.turn[passes]
+
+        # end of the round: beaten cards go to the discard pile, the attacker defends next
+        ends = active & (actions == END_ROUND)
+        self.discard[ends] |= self.attack[ends] | self.defense[ends]
+        self.defender[ends] = 1 - self.defender[ends]
+
+        # the defender takes every card on the table
+        takes = active & (actions == TAKE)
+        games = self._index[takes]
+        self.hands[games, self.defender[games]] |= self.attack[games] | self.defense[games]
+
+        round_over = ends | takes
+        self.turn[round_over] = 1 - self.turn[round_over]
+        self._clear_table(round_over)
+        self.rounds += round_over
+        self._refill(round_over)
+
+        # the game is over when the deck is empty and a player has no cards left
+        no_cards = self.hands == 0
+        finished = round_over & self._deck_empty() & no_cards.any(axis=1)
+        self.winner[finished] = np.where(no_cards[finished].all(axis=1), rules.TIE,
+                                         np.where(no_cards[finished, 0], 0, 1))
+        self.done |= finished
+        return finished
+
+    def state(self, game):  # rules.GameState of one game, table cards ordered by id
+        table = tuple((attack, None if self.slots[game, attack] < 0 else int(self.slots[game, attack]))
+                      for attack in rules.cards_of(int(self.attack[game])))
+        return rules.GameState(
+            tuple(int(card) for card in self.deck[game, self.cursor[game]:]),
+            int(self.trump[game]), bool(self.trump_taken[game]),
+            (int(self.hands[game, 0]), int(self.hands[game, 1])), table,
+            int(self.defender[game]), int(self.turn[game]), int(self.discard[game]))
+
+
+def play_random(num_games, batch_size=1024, seed=None):  # random against random
+    # returns (wins by player or rules.TIE, games by number of rounds, moves played)
+    # like durak_sim.run_chunk
+    games = BatchGames(min(batch_size, num_games), seed)
+    wins = Counter()
+    round_lengths = Counter()
+    total_moves = 0
+    started = games.size
+    finished_games = 0
+
+    while finished_games < num_games:
+        total_moves += games.size - int(games.done.sum())
+        finished = games.step(games.random_actions(), validate=False)
+        if not finished.any():
+            continue
+        wins.update(games.winner[finished].tolist())
+        round_lengths.update(games.rounds[finished].tolist())
+        finished_games += int(finished.sum())
+
+        # start new games in the finished slots until enough games were started
+        restart = finished & (np.cumsum(finished) <= num_games - started)
+        started += int(restart.sum())
+        games.reset(restart)
+
+    return wins, round_lengths, total_moves
@@ -0,0 +1,240 @@
+import argparse
+import fnmatch
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# durak-bench: times the hot paths of the game without a window and compares them
+# with a stored baseline
+#   python bench.py                          run everything, compare with bench_baseline.json
+#   python bench.py -k "deck.*" --json -     only the deck benchmarks, results as JSON
+#   python bench.py --save-baseline          store the results as the new baseline
+# the exit status is 1 if a benchmark got slower than the baseline by more than --threshold
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # Durak opens the display on import
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+import pygame
+import Durak
+import rules
+
+BASELINE_FILE = "bench_baseline.json"
+THRESHOLD = 0.25  # slower than the baseline by more than this share is a regression
+MIN_RUN_TIME = 0.1  # seconds, the calls per run are doubled until a run takes this long
+
+BENCHMARKS = {}  # name -> setup function returning (function to time, least calls per run)
+
+
+def benchmark(name):
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+def game_objects():  # the deck and both players, created once like in Durak.main()
+    if not Durak.players:
+        deck = Durak.Deck()
+        Durak.Player(deck, "player1", (400, Durak.screen.get_height() - 250))
+        Durak.Player(deck, "player2", (400, 100))
+    return Durak.players[0].deck, Durak.players[0], Durak.players[1]
+
+
+def big_hand_state():  # 40 cards in the first player's hand after taking many times
+    hands = (rules.mask_of(range(40)), rules.mask_of(range(40, rules.NUM_CARDS)))
+    return rules.GameState((), rules.NUM_CARDS - 1, True, hands, (), 1, 0)
+
+
+@benchmark("cards.create_cards")
+def bench_create_cards():
+    return lambda: Durak.Cards().create_cards(), 200
+
+
+@benchmark("deck.shuffle_deal")
+def bench_shuffle_deal():  # shuffle a full deck and deal all of it in hands of six
+    deck, _, _ = game_objects()
+    all_cards = list(deck.cards_by_id)
+
+    def run():
+        deck.set_cards(all_cards)
+        deck.trump_card_taken = False
+        deck.shuffle_deck()
+        hand = []
+        while len(deck):
+            deck.deal_cards(rules.HAND_SIZE, hand)
+    return run, 200
+
+
+@benchmark("player.is_valid_move")
+def bench_is_valid_move():  # every card against one attack card
+    deck, player, _ = game_objects()
+    Durak.set_state(rules.new_game(random.Random(1)))
+    player.card_to_defend = deck.cards_by_id[20]
+    cards = deck.cards_by_id
+
+    def run():
+        for card in cards:
+            player.is_valid_move(deck, card)
+    return run, 200
+
+
+@benchmark("is_enabled")
+def bench_is_enabled():  # both buttons, asked every frame
+    game_objects()
+    state = rules.new_game(random.Random(1))
+    Durak.set_state(state)
+    Durak.apply_move(rules.legal_moves(state)[0])
+
+    def run():
+        Durak.is_enabled("next_button")
+        Durak.is_enabled("end_round_button")
+    return run, 10000
+
+
+@benchmark("savefile.save_load")
+def bench_save_load():  # S then L, hands and the table are shown again after loading
+    deck, player1, player2 = game_objects()
+    Durak.set_state(rules.new_game(random.Random(1)))
+
+    def run():
+        Durak.save_data(deck, player1, player2)
+        Durak.load_data(deck, player1, player2)
+    return run, 100
+
+
+@benchmark("draw_hand.big")
+def bench_draw_hand():
+    deck, player, _ = game_objects()
+    Durak.restore_state(big_hand_state(), [list(range(40)), list(range(40, rules.NUM_CARDS))])
+    surface = pygame.Surface(Durak.screen.get_size())
+    background = pygame.Surface(Durak.screen.get_size())
+    for card in deck.cards_by_id:  # decode the textures before timing
+        card.draw((0, 0), surface)
+    return lambda: player.draw_hand(surface, background), 100
+
+
+@benchmark("game.scripted")
+def bench_scripted_game():  # a whole game of random moves, drawn after every move
+    _, player1, player2 = game_objects()
+    surface = pygame.Surface(Durak.screen.get_size())
+    background = pygame.Surface(Durak.screen.get_size())  # the hand layers copy it
+
+    def run():
+        rng = random.Random(7)
+        Durak.set_state(rules.new_game(rng))
+        while rules.winner(Durak.state) is None:
+            Durak.apply_move(rng.choice(rules.legal_moves(Durak.state)))
+            Durak.is_enabled("next_button")
+            Durak.is_enabled("end_round_button")
+            for player, opponent in ((player1, player2), (player2, player1)):
+                player.draw_hand(surface, background)
+                player.draw_cards_to_display(surface, Durak.isDefender(player), opponent)
+    return run, 5
+
+
+def measure(setup, repeat):  # seconds per call: best and median of repeat runs
+    func, number = setup()
+    func()  # warm up
+    gc_was_enabled = gc.isenabled()
+    gc.disable()  # like timeit, a collection would land in a random run
+    try:
+        while True:  # short runs are mostly timer and scheduler noise
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            if time.perf_counter() - start >= MIN_RUN_TIME:
+                break
+            number *= 2
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            times.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {"best": min(times), "median": statistics.median(times),
+            "number": number, "repeat": repeat}
+
+
+def run_benchmarks(pattern="*", repeat=5):
+    return {name: measure(setup, repeat) for name, setup in BENCHMARKS.items()
+            if fnmatch.fnmatchcase(name, pattern)}
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    # returns (name, baseline seconds, seconds) of the benchmarks that got slower
+    regressions = []
+    for name, result in results.items():
+        if name in baseline and result["best"] > baseline[name]["best"] * (1 + threshold):
+            regressions.append((name, baseline[name]["best"], result["best"]))
+    return regressions
+
+
+def print_results(results, baseline):
+    for name, result in results.items():
+        line = f"{name:24} {result['best'] * 1000000:12.1f} us"
+        if name in baseline:
+            change = result["best"] / baseline[name]["best"] - 1
+            line += f"   baseline {baseline[name]['best'] * 1000000:12.1f} us {change:+7.1%}"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="durak-bench", description="Time the hot paths of the game.")
+    parser.add_argument("-k", "--filter", default="*", metavar="PATTERN",
+                        help="only the benchmarks matching PATTERN: " + ", ".join(BENCHMARKS))
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_FILE,
+                        help="results to compare with (default: %(default)s)")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="allowed slowdown as a share (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store the results in the baseline file")
+    parser.add_argument("--json", metavar="PATH", help="write the results as JSON, - for stdout")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+
+    # save_data and load_data use a file of their own, the player's save is not touched
+    save_dir = tempfile.mkdtemp()
+    Durak.SAVE_FILE = os.path.join(save_dir, "bench_save.dat")
+    try:
+        results = run_benchmarks(args.filter, args.repeat)
+    finally:
+        shutil.rmtree(save_dir)
+    report = {"python": platform.python_version(), "pygame": pygame.version.ver,
+              "platform": platform.platform(), "results": results}
+
+    if args.json == "-":
+        print(json.dumps(report, indent=1))
+    else:
+        print_results(results, baseline)
+        if args.json:
+            with open(args.json, "w") as file:
+                json.dump(report, file, indent=1)
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=1)
+        print("Saved the baseline to " + args.baseline, file=sys.stderr)
+
+    regressions = compare(results, baseline, args.threshold)
+    for name, before, after in regressions:
+        print(f"Regression: {name} took {after * 1000000:.1f} us, "
+              f"baseline {before * 1000000:.1f} us", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
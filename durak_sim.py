@@ -0,0 +1,188 @@
+import argparse
+import json
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import rules
+import strategies
+import ismcts  # registers the "ismcts" strategy
+
+# durak-sim: plays full games between headless strategies on a process pool
+#   python durak_sim.py -n 1000000 --players greedy random --jobs 8 --seed 1
+#   python durak_sim.py --variant podkidnoy-36-4p --players greedy greedy random random
+
+CHUNK_SIZE = 1000  # games per task, every chunk gets its own random stream
+BATCH_CHUNK_SIZE = 20000  # games per task with the NumPy batch engine
+
+
+stream = rules.stream  # independent, reproducible random stream number index
+
+
+def play_game(players, rng, profile=rules.CLASSIC):  # returns (final state, rounds, moves)
+    state = rules.new_game(rng, profile)
+    rounds = 0
+    moves = 0
+    for seat, player in enumerate(players):
+        player.start_game(seat)
+    while True:
+        legal = rules.legal_moves(state)
+        if not legal:
+            return state, rounds, moves
+        move = players[state.turn].choose_move(state, legal)
+        if move[0] in (rules.END_ROUND, rules.TAKE):
+            rounds += 1
+        new_state = rules.apply(state, move, validate=False)  # move is one of legal
+        for player in players:
+            player.observe(state, move, new_state)
+        state = new_state
+        moves += 1
+
+
+def run_chunk(names, seed, index, num_games, variant="classic"):
+    # plays one chunk, returns its statistics
+    profile = rules.get_profile(variant)  # by name, the worker processes have their own
+    rng = stream(seed, index)
+    players = [strategies.create(name, random.Random(rng.random())) for name in names]
+    wins = Counter()  # seat of the strategy in names (or TIE) -> games won
+    losses = Counter()  # seat of the strategy in names -> games it was left the durak
+    round_lengths = Counter()  # rounds per game -> games
+    total_moves = 0
+
+    for game in range(num_games):
+        # players move on one seat every game so that nobody always attacks first
+        order = tuple((seat + game) % len(names) for seat in range(len(names)))
+        state, rounds, moves = play_game([players[seat] for seat in order], rng, profile)
+        winner = rules.winner(state)
+        wins[rules.TIE if winner == rules.TIE else order[winner]] += 1
+        if winner != rules.TIE:
+            losses[order[rules.loser(state)]] += 1
+        round_lengths[rounds] += 1
+        total_moves += moves
+
+    return wins, round_lengths, total_moves, losses
+
+
+def run_batch_chunk(names, seed, index, num_games, variant, batch_size):  # random against random
+    import batch  # needs numpy
+    wins, round_lengths, total_moves = batch.play_random(num_games, batch_size, seed=(seed, index))
+    losses = Counter({seat: wins[1 - seat] for seat in (0, 1)})
+    return wins, round_lengths, total_moves, losses
+
+
+def simulate(names, num_games, seed=0, jobs=1, batch_size=None, profile=rules.CLASSIC):
+    if len(names) != profile.players:
+        raise ValueError(f"{profile.name} is played by {profile.players} players")
+    if "ismcts" in names and profile is not rules.CLASSIC:
+        raise ValueError("ismcts only plays the classic rules")
+    chunk_size = BATCH_CHUNK_SIZE if batch_size else CHUNK_SIZE
+    chunks = [(names, seed, index, min(chunk_size, num_games - start), profile.name)
+              for index, start in enumerate(range(0, num_games, chunk_size))]
+    task = run_chunk
+    if batch_size:
+        if set(names) != {"random"} or profile is not rules.CLASSIC:
+            raise ValueError("The batch engine only plays random against random, classic rules")
+        task = run_batch_chunk
+        chunks = [chunk + (batch_size,) for chunk in chunks]
+    wins = Counter()
+    losses = Counter()
+    round_lengths = Counter()
+    total_moves = 0
+
+    start_time = time.perf_counter()
+    if jobs == 1:
+        results = (task(*chunk) for chunk in chunks)
+        for result in results:
+            wins.update(result[0])
+            round_lengths.update(result[1])
+            total_moves += result[2]
+            losses.update(result[3])
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for result in pool.map(task, *zip(*chunks)):
+                wins.update(result[0])
+                round_lengths.update(result[1])
+                total_moves += result[2]
+                losses.update(result[3])
+    elapsed = time.perf_counter() - start_time
+
+    return {
+        "players": list(names),
+        "variant": profile.name,
+        "games": num_games,
+        "seed": seed,
+        "jobs": jobs,
+        "batch_size": batch_size,
+        "seconds": elapsed,
+        "games_per_second": num_games / elapsed if elapsed else 0.0,
+        "moves": total_moves,
+        "wins": [wins[seat] for seat in range(len(names))],
+        "ties": wins[rules.TIE],
+        "losses": [losses[seat] for seat in range(len(names))],
+        "round_lengths": dict(sorted(round_lengths.items())),
+    }
+
+
+def percentile(histogram, fraction):  # value below which fraction of the games fall
+    total = sum(histogram.values())
+    seen = 0
+    for value, games in sorted(histogram.items()):
+        seen += games
+        if seen >= fraction * total:
+            return value
+    return None
+
+
+def print_report(report):
+    games = report["games"]
+    print(f"{games} games of {report['variant']} in {report['seconds']:.2f} s "
+          f"({report['games_per_second']:.2f} games/s, {report['jobs']} jobs)")
+    for seat, name in enumerate(report["players"]):
+        wins = report["wins"][seat]
+        losses = report["losses"][seat]
+        print(f"  player {seat + 1} ({name}): {wins} wins ({100 * wins / games:.2f}%), "
+              f"{losses} times durak ({100 * losses / games:.2f}%)")
+    print(f"  ties: {report['ties']} ({100 * report['ties'] / games:.2f}%)")
+
+    lengths = report["round_lengths"]
+    mean = sum(rounds * count for rounds, count in lengths.items()) / games
+    print(f"  rounds per game: mean {mean:.2f}, min {min(lengths)}, "
+          f"median {percentile(lengths, 0.5)}, p90 {percentile(lengths, 0.9)}, "
+          f"p99 {percentile(lengths, 0.99)}, max {max(lengths)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="durak-sim", description="Play Durak games between headless strategies.")
+    parser.add_argument("-n", "--games", type=int, default=10000)
+    parser.add_argument("-p", "--players", nargs="+", default=["greedy", "random"],
+                        metavar="STRATEGY", help=", ".join(strategies.STRATEGIES)
+                        + ", one for every player")
+    parser.add_argument("--variant", default="classic",
+                        help="rules: " + ", ".join(profile.name for profile in rules.PROFILES))
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: all cores)")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("-b", "--batch", type=int, metavar="SIZE",
+                        help="play SIZE games at once with the NumPy batch engine "
+                             "(random against random only)")
+    parser.add_argument("--json", action="store_true",
+                        help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        profile = rules.get_profile(args.variant)
+        for name in args.players:
+            strategies.create(name)  # fail early on unknown names
+        report = simulate(args.players, args.games, args.seed, args.jobs, args.batch, profile)
+    except ValueError as error:
+        parser.error(str(error))
+    if args.json:
+        print(json.dumps(report))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
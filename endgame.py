@@ -0,0 +1,268 @@
+import random
+import time
+import instrument
+import rules
+
+# exact endgame solver. Once the deck and the trump card are gone both players know
+# every card in play, so the game has perfect information and alpha-beta search with
+# a transposition table finds the game-theoretic result and a best move.
+#
+# Positions are (hand 0, hand 1, undefended attack cards, beaten cards on the table,
+# defender, turn). Which card beat which does not matter any more once it is beaten,
+# so those cards are one set. The discard pile cannot change the result either.
+
+WIN, TIE, LOSS = 1, 0, -1  # results for the player to move
+EXACT, LOWER, UPPER = 0, 1, 2  # kinds of transposition table values
+
+# Zobrist keys: a random 64-bit number per (place, card), a position's hash is the
+# xor of the keys of every card at its place, so a move only updates a few keys
+_keys = random.Random(2024)
+HAND_KEYS = tuple(tuple(_keys.getrandbits(64) for card in range(rules.NUM_CARDS))
+                  for player in range(2))
+UNDEFENDED_KEYS = tuple(_keys.getrandbits(64) for card in range(rules.NUM_CARDS))
+BEATEN_KEYS = tuple(_keys.getrandbits(64) for card in range(rules.NUM_CARDS))
+DEFENDER_KEY = _keys.getrandbits(64)  # defender is player 1
+TURN_KEY = _keys.getrandbits(64)  # player 1 to move
+TRUMP_KEYS = tuple(_keys.getrandbits(64) for suit in rules.SUITS)
+del _keys
+
+LOWEST_SUIT = rules.SUIT_MASKS[0]  # one bit per rank
+
+
+class SearchLimit(Exception):  # the position needs more than max_nodes or time to be solved
+    pass
+
+
+def same_rank(mask):  # every card sharing a rank with a card in the mask
+    ranks = (mask | mask >> 1 | mask >> 2 | mask >> 3) & LOWEST_SUIT
+    return ranks | ranks << 1 | ranks << 2 | ranks << 3
+
+
+def zobrist(position, trump_suit):  # hash of a position, computed from scratch
+    hand0, hand1, undefended, beaten, defender, turn = position
+    key = TRUMP_KEYS[trump_suit]
+    for card in rules.cards_of(hand0):
+        key ^= HAND_KEYS[0][card]
+    for card in rules.cards_of(hand1):
+        key ^= HAND_KEYS[1][card]
+    for card in rules.cards_of(undefended):
+        key ^= UNDEFENDED_KEYS[card]
+    for card in rules.cards_of(beaten):
+        key ^= BEATEN_KEYS[card]
+    if defender:
+        key ^= DEFENDER_KEY
+    if turn:
+        key ^= TURN_KEY
+    return key
+
+
+def position_of(state):
+    beaten = 0
+    for attack, defense in state.table:
+        if defense is not None:
+            beaten |= 1 << attack | 1 << defense
+    undefended = rules.mask_of(state.undefended())
+    return (state.hands[0], state.hands[1], undefended, beaten, state.defender, state.turn)
+
+
+class TranspositionTable:  # fixed number of buckets with two entries each
+    # the first entry of a bucket keeps the position that took the most work to solve,
+    # the second one is always replaced, so the table never grows past its size
+    def __init__(self, size=1 << 18):
+        self.size = size
+        self._mask = size - 1  # size is a power of two
+        self._entries = [None] * (2 * size)  # (key, value, kind, move, work)
+
+    def get(self, key):
+        index = 2 * (key & self._mask)
+        entry = self._entries[index]
+        if entry is not None and entry[0] == key:
+            return entry
+        entry = self._entries[index + 1]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def put(self, key, value, kind, move, work):
+        index = 2 * (key & self._mask)
+        kept = self._entries[index]
+        if kept is None or kept[0] == key or work >= kept[4]:
+            self._entries[index] = (key, value, kind, move, work)
+        else:
+            self._entries[index + 1] = (key, value, kind, move, work)
+
+    def clear(self):
+        self._entries = [None] * (2 * self.size)
+
+
+class EndgameSolver:
+    def __init__(self, table_size=1 << 18):
+        self.table = TranspositionTable(table_size)
+        self.nodes = 0  # positions searched, over all solve() calls
+        self._node_limit = None
+        self._deadline = None
+
+    @instrument.probe()
+    def solve(self, state, max_nodes=None, time_limit=None):
+        # returns (winner or rules.TIE, best move or None if the game is over). Big endings
+        # can take very long, after max_nodes positions or time_limit seconds SearchLimit
+        # is raised; what was solved so far stays in the table
+        if not state.deck_empty():
+            raise ValueError("The endgame solver needs an empty deck")
+        result = rules.winner(state)
+        if result is not None:
+            return result, None
+
+        trump_suit = state.trump_suit
+        position = position_of(state)
+        self._node_limit = None if max_nodes is None else self.nodes + max_nodes
+        self._deadline = None if time_limit is None else time.perf_counter() + time_limit
+        value, move = self._search(position, zobrist(position, trump_suit), trump_suit,
+                                   LOSS, WIN)
+        if value == TIE:
+            result = rules.TIE
+        else:
+            result = state.turn if value == WIN else 1 - state.turn
+        return result, self._rules_move(state, move)
+
+    def _rules_move(self, state, move):  # the solver's move as a rules move
+        kind, card = move
+        if kind == rules.DEFEND:  # the solver always beats the lowest undefended card
+            return (kind, card, min(state.undefended()))
+        return (kind, card, None)
+
+    def _moves(self, position, trump_suit):  # (kind, card) moves, most promising first
+        hand0, hand1, undefended, beaten, defender, turn = position
+        hand = hand1 if turn else hand0
+        trumps = rules.SUIT_MASKS[trump_suit]
+
+        if turn != defender:
+            table = undefended | beaten
+            cards = hand & same_rank(table) if table else hand
+            # cheap cards first, trumps last
+            moves = [(rules.ATTACK, card) for card in rules.cards_of(cards & ~trumps)]
+            moves.extend((rules.ATTACK, card) for card in rules.cards_of(cards & trumps))
+            if table:
+                moves.append((rules.PASS if undefended else rules.END_ROUND, None))
+            return moves
+
+        if not undefended:
+            return [(rules.PASS, None)]
+        # the order in which the defender beats the cards does not change anything, so
+        # only the lowest undefended card is beaten next
+        target = (undefended & -undefended).bit_length() - 1
+        cards = hand & rules.BEATS[trump_suit][target]
+        moves = [(rules.DEFEND, card) for card in rules.cards_of(cards & ~trumps)]
+        moves.extend((rules.DEFEND, card) for card in rules.cards_of(cards & trumps))
+        moves.append((rules.TAKE, None))
+        return moves
+
+    def _apply(self, position, key, move, trump_suit):  # returns (position, key) after move
+        hand0, hand1, undefended, beaten, defender, turn = position
+        kind, card = move
+
+        if kind == rules.ATTACK:
+            key ^= HAND_KEYS[turn][card] ^ UNDEFENDED_KEYS[card]
+            bit = 1 << card
+            if turn:
+                hand1 &= ~bit
+            else:
+                hand0 &= ~bit
+            return (hand0, hand1, undefended | bit, beaten, defender, turn), key
+
+        if kind == rules.DEFEND:
+            target = (undefended & -undefended).bit_length() - 1
+            key ^= HAND_KEYS[turn][card] ^ BEATEN_KEYS[card] ^ \
+                UNDEFENDED_KEYS[target] ^ BEATEN_KEYS[target]
+            bit = 1 << card
+            if turn:
+                hand1 &= ~bit
+            else:
+                hand0 &= ~bit
+            return (hand0, hand1, undefended & ~(1 << target), beaten | bit | 1 << target,
+                    defender, turn), key
+
+        key ^= TURN_KEY
+        if kind == rules.PASS:
+            return (hand0, hand1, undefended, beaten, defender, 1 - turn), key
+
+        for card in rules.cards_of(beaten):
+            key ^= BEATEN_KEYS[card]
+        if kind == rules.END_ROUND:
+            key ^= DEFENDER_KEY
+            return (hand0, hand1, 0, 0, 1 - defender, 1 - turn), key
+
+        # TAKE
+        for card in rules.cards_of(undefended):
+            key ^= UNDEFENDED_KEYS[card] ^ HAND_KEYS[defender][card]
+        for card in rules.cards_of(beaten):
+            key ^= HAND_KEYS[defender][card]
+        if defender:
+            hand1 |= undefended | beaten
+        else:
+            hand0 |= undefended | beaten
+        return (hand0, hand1, 0, 0, defender, 1 - turn), key
+
+    def _search(self, position, key, trump_suit, alpha, beta):  # returns (value, best move)
+        # value is from the point of view of the player to move, alpha and beta too
+        self.nodes += 1
+        if self._node_limit is not None and self.nodes > self._node_limit:
+            raise SearchLimit()
+        if self._deadline is not None and self.nodes & 1023 == 0 and \
+                time.perf_counter() > self._deadline:  # the clock is read every 1024 nodes
+            raise SearchLimit()
+        hand0, hand1, undefended, beaten, defender, turn = position
+        if not undefended | beaten and not (hand0 and hand1):  # game over
+            if not hand0 and not hand1:
+                return TIE, None
+            return (WIN if not (hand1 if turn else hand0) else LOSS), None
+
+        entry = self.table.get(key)
+        hash_move = None
+        if entry is not None:
+            _, value, kind, hash_move, _ = entry
+            if kind == EXACT or (kind == LOWER and value >= beta) or \
+                    (kind == UPPER and value <= alpha):
+                return value, hash_move
+            if kind == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+
+        original_alpha = alpha
+        nodes = self.nodes
+        moves = self._moves(position, trump_suit)
+        if hash_move is not None:
+            moves.remove(hash_move)
+            moves.insert(0, hash_move)
+
+        best_value, best_move = LOSS - 1, None
+        for move in moves:
+            child, child_key = self._apply(position, key, move, trump_suit)
+            if child[5] == turn:  # the same player moves again
+                value = self._search(child, child_key, trump_suit, alpha, beta)[0]
+            else:
+                value = -self._search(child, child_key, trump_suit, -beta, -alpha)[0]
+            if value > best_value:
+                best_value, best_move = value, move
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+
+        if best_value <= original_alpha:
+            kind = UPPER
+        elif best_value >= beta:
+            kind = LOWER
+        else:
+            kind = EXACT
+        self.table.put(key, best_value, kind, best_move, self.nodes - nodes)
+        return best_value, best_move
+
+
+solver = EndgameSolver()  # shared by the bots and the hint, keeps its table between moves
+
+
+def solve(state, max_nodes=None, time_limit=None):
+    # (winner or rules.TIE, best move) of a state with an empty deck
+    return solver.solve(state, max_nodes, time_limit)
@@ -0,0 +1,147 @@
+import fnmatch
+import functools
+import logging
+import os
+import time
+
+# switchable instrumentation. Functions decorated with @probe() get a Probe that is
+# off by default, then the wrapper only checks probe.enabled and calls the function.
+# Probes can be switched on by name at runtime (or with the DURAK_PROBES environment
+# variable, e.g. DURAK_PROBES="Player.*,DirtyRenderer.render") and count the calls,
+# time every sample_every-th call into a histogram and can log the calls.
+
+logger = logging.getLogger("durak")
+BUCKETS = 32  # histogram bucket i counts calls that took less than 2 ** i microseconds
+
+probes = {}  # name -> Probe
+_patterns = {}  # name pattern -> (sample_every, log_calls) of probes switched on by name
+
+
+class Probe:
+    __slots__ = ("name", "enabled", "sample_every", "log_calls", "calls", "sampled",
+                 "total_time", "histogram", "_countdown")
+
+    def __init__(self, name):
+        self.name = name
+        self.enabled = False
+        self.sample_every = 1  # time one call in sample_every calls
+        self.log_calls = False
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.sampled = 0  # timed calls
+        self.total_time = 0.0  # seconds spent in the timed calls
+        self.histogram = [0] * BUCKETS
+        self._countdown = 1
+
+    def record(self, seconds):
+        self.sampled += 1
+        self.total_time += seconds
+        self.histogram[min(int(seconds * 1000000).bit_length(), BUCKETS - 1)] += 1
+
+    def call(self, func, args, kwargs):
+        self.calls += 1
+        if self.log_calls:  # arguments are only formatted if the message is logged
+            logger.info("Calling function %s", self.name)
+        self._countdown -= 1
+        if self._countdown > 0:
+            result = func(*args, **kwargs)
+        else:
+            self._countdown = self.sample_every
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            self.record(time.perf_counter() - start)
+        if self.log_calls:
+            logger.info("Function %s returned %r", self.name, result)
+        return result
+
+    def percentile(self, fraction):  # upper bound in seconds of the fraction of timed calls
+        seen = 0
+        for bucket, calls in enumerate(self.histogram):
+            seen += calls
+            if calls and seen >= fraction * self.sampled:
+                return (1 << bucket) / 1000000
+        return 0.0
+
+    def mean(self):
+        return self.total_time / self.sampled if self.sampled else 0.0
+
+
+def get_probe(name):
+    result = probes.get(name)
+    if result is None:
+        result = probes[name] = Probe(name)
+        for pattern, (sample_every, log_calls) in _patterns.items():
+            if fnmatch.fnmatchcase(name, pattern):  # switched on before it existed
+                result.enabled = True
+                result.sample_every = sample_every
+                result.log_calls = log_calls
+    return result
+
+
+def probe(name=None):  # decorator, the probe is named after the function by default
+    def decorator(func):
+        func_probe = get_probe(name or func.__qualname__)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not func_probe.enabled:
+                return func(*args, **kwargs)
+            return func_probe.call(func, args, kwargs)
+        wrapper.probe = func_probe
+        return wrapper
+    return decorator
+
+
+def enable(pattern="*", sample_every=1, log_calls=False):  # switch probes on by name
+    _patterns[pattern] = (sample_every, log_calls)
+    for name, each in probes.items():
+        if fnmatch.fnmatchcase(name, pattern):
+            each.enabled = True
+            each.sample_every = sample_every
+            each.log_calls = log_calls
+
+
+def disable(pattern="*"):
+    for known in [known for known in _patterns if fnmatch.fnmatchcase(known, pattern)]:
+        del _patterns[known]
+    for name, each in probes.items():
+        if fnmatch.fnmatchcase(name, pattern):
+            each.enabled = False
+
+
+def enabled():  # names of the probes that are switched on
+    return [name for name, each in probes.items() if each.enabled]
+
+
+def report():  # one line per probe that was called
+    lines = []
+    for name, each in sorted(probes.items()):
+        if each.calls:
+            lines.append(f"{name}: {each.calls} calls, {each.sampled} timed, "
+                         f"mean {each.mean() * 1000:.3f} ms, "
+                         f"p50 < {each.percentile(0.5) * 1000:.3f} ms, "
+                         f"p99 < {each.percentile(0.99) * 1000:.3f} ms")
+    return lines
+
+
+def print_report():
+    for line in report():
+        print(line)
+
+
+def enable_from_environment(environ=os.environ):
+    # DURAK_PROBES - comma separated name patterns, DURAK_PROBE_SAMPLE - sample_every,
+    # DURAK_PROBE_LOG=1 also logs every call
+    try:
+        sample_every = max(int(environ.get("DURAK_PROBE_SAMPLE", "1")), 1)
+    except ValueError:
+        logger.warning("DURAK_PROBE_SAMPLE is not a number, timing every call")
+        sample_every = 1
+    for pattern in environ.get("DURAK_PROBES", "").split(","):
+        if pattern.strip():
+            enable(pattern.strip(), sample_every, environ.get("DURAK_PROBE_LOG") == "1")
+
+
+enable_from_environment()
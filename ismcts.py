@@ -0,0 +1,280 @@
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import endgame
+import instrument
+import rules
+import strategies
+
+# Information Set Monte Carlo Tree Search. Every iteration deals the cards the player
+# cannot see at random (consistent with what it knows), walks one shared tree and plays
+# the game out with a fast greedy policy. Root-parallel: every worker process searches
+# its own tree and the root statistics are added up. Once the deck is empty the game
+# has perfect information and the endgame solver plays instead.
+
+# the probes on search() and the solver only see the calls in this process, the worker
+# processes keep their own. This one times every search from submit to result instead
+worker_probe = instrument.get_probe("ISMCTS.workers")
+
+EXPLORATION = 0.7
+ENDGAME_NODES = 20000  # positions the endgame solver may search before ISMCTS takes over
+
+
+class Knowledge:  # what a player knows about the cards in the opponent's hand
+    def __init__(self, player):
+        self.player = player
+        self.opponent_cards = 0  # mask of cards the opponent is known to hold
+
+    def observe(self, state, move, new_state):  # called after every move of the game
+        opponent = 1 - self.player
+        kind, card, _ = move
+        if state.turn == opponent and kind in (rules.ATTACK, rules.DEFEND):
+            self.opponent_cards &= ~(1 << card)
+        elif kind == rules.TAKE and state.defender == opponent:  # picked up the table
+            self.opponent_cards |= state.table_mask()
+        # the turned up trump card was drawn and it is not in our hand
+        if new_state.trump_taken and not state.trump_taken and \
+                not new_state.hands[self.player] >> new_state.trump & 1:
+            self.opponent_cards |= 1 << new_state.trump
+
+
+def determinize(state, player, known, rng):  # deal the unseen cards consistently with known
+    opponent = 1 - player
+    unseen = state.unseen(player)
+    known = list(rules.cards_of(known & unseen))
+    hand_size = rules.count(state.hands[opponent])
+    rng.shuffle(known)
+    hidden = known[hand_size:] + list(rules.cards_of(unseen & ~rules.mask_of(known)))
+    known = known[:hand_size]  # only if the knowledge is stale, e.g. after loading a game
+    rng.shuffle(hidden)
+
+    missing = hand_size - len(known)
+    hands = list(state.hands)
+    hands[opponent] = rules.mask_of(known + hidden[:missing])
+    return state._replace(hands=tuple(hands), deck=tuple(hidden[missing:]))
+
+
+class Node:
+    __slots__ = ("move", "player", "children", "visits", "wins", "available")
+
+    def __init__(self, move=None, player=None):
+        self.move = move
+        self.player = player  # player who made the move, wins are counted for them
+        self.children = {}  # move -> Node
+        self.visits = 0
+        self.wins = 0.0
+        self.available = 0  # iterations in which the move was legal
+
+    def score(self):  # upper confidence bound, with availability instead of parent visits
+        return self.wins / self.visits + \
+            EXPLORATION * math.sqrt(math.log(self.available) / self.visits)
+
+
+def lowest(mask):  # cheapest card of the mask, lowest rank first
+    return (mask & -mask).bit_length() - 1
+
+
+def playout_move(state):  # like strategies.GreedyStrategy, straight from the card masks
+    hand = state.hands[state.turn]
+    trumps = rules.SUIT_MASKS[state.trump_suit]
+    undefended = state.undefended()
+
+    if state.turn == state.attacker:
+        if not state.table:
+            return (rules.ATTACK, lowest(hand & ~trumps or hand), None)
+        throw_ins = hand & state.throw_in_mask()
+        if not state.deck_empty():
+            throw_ins &= ~trumps  # keep the trumps while cards are still drawn
+        if throw_ins:
+            return (rules.ATTACK, lowest(throw_ins & ~trumps or throw_ins), None)
+        return (rules.PASS if undefended else rules.END_ROUND, None, None)
+
+    if not undefended:
+        return (rules.PASS, None, None)
+    attack = undefended[0]
+    beating = hand & rules.BEATS[state.trump_suit][attack]
+    if not beating:
+        return (rules.TAKE, None, None)
+    return (rules.DEFEND, lowest(beating & ~trumps or beating), attack)
+
+
+def reward(result, player):
+    if result == rules.TIE:
+        return 0.5
+    return 1.0 if result == player else 0.0
+
+
+@instrument.probe()
+def search(state, player, known=0, time_budget=None, iterations=None, seed=None):
+    # returns {move: (visits, wins)} of the root moves
+    rng = random.Random(seed)
+    root = Node()
+    deadline = time.perf_counter() + time_budget if time_budget else None
+
+    iteration = 0
+    while (iterations is None or iteration < iterations) and \
+            (deadline is None or time.perf_counter() < deadline):
+        iteration += 1
+        game = determinize(state, player, known, rng)
+        node = root
+        path = [root]
+
+        # selection and expansion
+        while True:
+            moves = rules.legal_moves(game)
+            if not moves:
+                break
+            untried = []
+            for move in moves:
+                child = node.children.get(move)
+                if child is None:
+                    untried.append(move)
+                else:
+                    child.available += 1
+            if untried:
+                move = rng.choice(untried)
+                child = Node(move, game.turn)
+                child.available = 1
+                node.children[move] = child
+                node = child
+                path.append(node)
+                game = rules.apply(game, move, validate=False)
+                break
+            node = max((node.children[move] for move in moves), key=Node.score)
+            path.append(node)
+            game = rules.apply(game, node.move, validate=False)
+
+        # playout
+        result = rules.winner(game)
+        while result is None:
+            game = rules.apply(game, playout_move(game), validate=False)
+            result = rules.winner(game)
+
+        for node in path:
+            node.visits += 1
+            if node.player is not None:
+                node.wins += reward(result, node.player)
+
+    return {move: (child.visits, child.wins) for move, child in root.children.items()}
+
+
+def best_move(statistics):  # most visited root move
+    return max(statistics, key=lambda move: statistics[move])
+
+
+def endgame_move(state, player, known=0, time_budget=None, iterations=None, seed=None):
+    # solves the game exactly if it is small enough, otherwise searches like search().
+    # The solver may use half of the time budget, the search gets what is left
+    start = time.perf_counter()
+    try:
+        return endgame.solve(state, ENDGAME_NODES,
+                             None if time_budget is None else time_budget / 2)[1]
+    except endgame.SearchLimit:
+        if time_budget is not None:
+            time_budget = max(time_budget - (time.perf_counter() - start), 0.001)
+        return best_move(search(state, player, known, time_budget, iterations, seed))
+
+
+class PendingSearch:  # a search running in the worker processes
+    def __init__(self, futures):
+        self.futures = futures
+
+    def done(self):
+        return all(future.done() for future in self.futures)
+
+    def best_move(self):  # waits for the workers if they are not done yet
+        statistics = {}
+        for future in self.futures:
+            for move, (visits, wins) in future.result().items():
+                total_visits, total_wins = statistics.get(move, (0, 0.0))
+                statistics[move] = (total_visits + visits, total_wins + wins)
+        return best_move(statistics)
+
+
+class PendingMove:  # a move chosen in one worker process
+    def __init__(self, future):
+        self.future = future
+
+    def done(self):
+        return self.future.done()
+
+    def best_move(self):
+        return self.future.result()
+
+
+class FinishedSearch:
+    def __init__(self, move):
+        self.move = move
+
+    def done(self):
+        return True
+
+    def best_move(self):
+        return self.move
+
+
+class ISMCTS:
+    def __init__(self, time_budget=0.2, workers=1, iterations=None, seed=None):
+        self.time_budget = time_budget  # seconds per move
+        self.iterations = iterations  # per worker, None for no limit
+        self.workers = workers  # 0 searches in the calling process and blocks it
+        self.rng = random.Random(seed)
+        self._pool = ProcessPoolExecutor(workers) if workers else None
+
+    @instrument.probe()
+    def start(self, state, player, known=0):  # root-parallel search in the worker processes
+        moves = rules.legal_moves(state)
+        if len(moves) == 1:
+            return FinishedSearch(moves[0])
+        if state.deck_empty():  # both hands are known, try to solve the game exactly
+            arguments = (state, player, known, self.time_budget, self.iterations,
+                         self.rng.random())
+            if self._pool is None:
+                return FinishedSearch(endgame_move(*arguments))
+            return PendingMove(self._submit(endgame_move, *arguments))
+        if self._pool is None:
+            return FinishedSearch(best_move(search(
+                state, player, known, self.time_budget, self.iterations, self.rng.random())))
+        return PendingSearch([
+            self._submit(search, state, player, known, self.time_budget,
+                         self.iterations, self.rng.random())
+            for _ in range(self.workers)])
+
+    def _submit(self, func, *args):
+        future = self._pool.submit(func, *args)
+        if worker_probe.enabled:
+            worker_probe.calls += 1
+            start = time.perf_counter()
+            future.add_done_callback(lambda _: worker_probe.record(time.perf_counter() - start))
+        return future
+
+    def choose_move(self, state, player, known=0):  # blocking search
+        return self.start(state, player, known).best_move()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+
+class ISMCTSStrategy(strategies.Strategy):  # headless ISMCTS player for durak-sim
+    iterations = 200
+
+    def __init__(self, rng=None):
+        super().__init__(rng)
+        self.search = ISMCTS(time_budget=None, workers=0, iterations=self.iterations,
+                             seed=self.rng.random())
+        self.knowledge = None
+
+    def start_game(self, player):
+        self.knowledge = Knowledge(player)
+
+    def observe(self, state, move, new_state):
+        self.knowledge.observe(state, move, new_state)
+
+    def choose_move(self, state, moves):
+        return self.search.choose_move(state, state.turn, self.knowledge.opponent_cards)
+
+
+strategies.STRATEGIES["ismcts"] = ISMCTSStrategy
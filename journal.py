@@ -0,0 +1,99 @@
+import os
+import struct
+import rules
+import savefile
+
+# append-only journal of the current game for crash recovery. The file starts with a
+# snapshot of a whole game (a savefile encoding) followed by one small record per move.
+# Every snapshot_every moves another snapshot is appended, so recovery never replays
+# more than that many moves. A new game starts a new file.
+
+SNAPSHOT = 1  # record tags
+MOVE = 2
+SNAPSHOT_RECORD = struct.Struct("<BH")  # tag, length of the saved game that follows
+MOVE_RECORD = struct.Struct("<BBBB")  # tag, kind, card, target
+NO_CARD = savefile.NO_CARD
+
+
+def encode_move(move):
+    kind, card, target = move
+    return MOVE_RECORD.pack(MOVE, kind, NO_CARD if card is None else card,
+                            NO_CARD if target is None else target)
+
+
+def decode_move(data, offset=0):
+    _, kind, card, target = MOVE_RECORD.unpack_from(data, offset)
+    return (kind, None if card == NO_CARD else card, None if target == NO_CARD else target)
+
+
+class Journal:
+    def __init__(self, path, snapshot_every=64):
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.moves_since_snapshot = 0
+        self._file = None
+
+    def start(self, state, hands):  # begin a new journal with a snapshot of the game
+        self.close()
+        # unbuffered, every record reaches the operating system as soon as it is written
+        self._file = open(self.path, "wb", buffering=0)
+        self.snapshot(state, hands)
+
+    def snapshot(self, state, hands):  # recovery starts from the last snapshot
+        data = savefile.encode(state, hands)
+        self._file.write(SNAPSHOT_RECORD.pack(SNAPSHOT, len(data)) + data)
+        self.moves_since_snapshot = 0
+
+    def append(self, move):  # returns True when it is time for a new snapshot
+        self._file.write(encode_move(move))
+        self.moves_since_snapshot += 1
+        return self.moves_since_snapshot >= self.snapshot_every
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def delete(self):  # the game is over, there is nothing to recover
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def recover(path):  # returns (snapshot state, hands, moves after it) or None
+    # a record cut off by a crash and everything after an unreadable record is ignored
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        return None
+
+    snapshot = None
+    moves = []
+    offset = 0
+    while offset < len(data):
+        tag = data[offset]
+        if tag == SNAPSHOT and offset + SNAPSHOT_RECORD.size <= len(data):
+            _, length = SNAPSHOT_RECORD.unpack_from(data, offset)
+            offset += SNAPSHOT_RECORD.size
+            try:
+                snapshot = savefile.decode(data[offset:offset + length])
+            except savefile.SaveError:
+                break
+            offset += length
+            moves = []
+        elif tag == MOVE and offset + MOVE_RECORD.size <= len(data) and snapshot is not None:
+            moves.append(decode_move(data, offset))
+            offset += MOVE_RECORD.size
+        else:
+            break
+    if snapshot is None:
+        return None
+
+    state, hands = snapshot
+    for i, move in enumerate(moves):  # keep the moves that can still be played
+        if not rules.is_legal(state, move):
+            moves = moves[:i]
+            break
+        state = rules.apply(state, move, validate=False)
+    return snapshot[0], hands, moves
@@ -0,0 +1,99 @@
+from bisect import bisect_left, bisect_right
+import pygame
+
+# where every card in the hands and on the table is drawn. The layout is computed again
+# only when the game state changes, drawing and hit-testing just look it up.
+
+CARD_SIZE = (100, 150)
+HAND_GAP = 10  # horizontal gap between cards in a hand
+CARDS_PER_ROW = 8  # a hand continues in another row, shifted down by ROW_OFFSET
+ROW_OFFSET = 35
+TABLE_GAP = 20  # horizontal gap between attack cards on the table
+DEFENSE_OFFSET = 40  # how much lower a defending card lies than the card it beats
+
+
+class SpatialIndex:  # finds the topmost rect at a point, rects added later are on top
+    def __init__(self, items):  # items - (rect, key) from bottom to top
+        # the x coordinates of the rect edges cut the plane into slabs, every slab keeps
+        # the rects that cover it from top to bottom
+        self._edges = sorted({x for rect, _ in items for x in (rect.left, rect.right)})
+        self._slabs = [[] for _ in self._edges]
+        for rect, key in items:
+            for slab in range(bisect_left(self._edges, rect.left),
+                              bisect_left(self._edges, rect.right)):
+                self._slabs[slab].append((rect, key))
+        for slab in self._slabs:
+            slab.reverse()
+
+    def at(self, pos):  # key of the topmost rect containing pos, or None
+        slab = bisect_right(self._edges, pos[0]) - 1
+        if slab < 0:
+            return None
+        for rect, key in self._slabs[slab]:
+            if rect.collidepoint(pos):
+                return key
+        return None
+
+
+class Layout:
+    def __init__(self):
+        self.hands = []  # for every player: (card, rect) from bottom to top
+        self.table = []  # (attack card, rect, defending card or None, rect or None)
+        self.updates = 0  # how often the layout was computed
+        self.hand_versions = []  # for every player: changes when the hand's cards or places do
+        self.table_area = pygame.Rect(0, 0, 0, 0)  # cards dropped here are played
+        self._hand_indexes = []
+        self._attack_index = SpatialIndex([])
+
+    def update(self, screen_size, hands, table):
+        # hands - (cards, top left corner of the hand) of every player
+        # table - (attack card, defending card or None) in the order they were played
+        self.updates += 1
+        previous = self.hands
+        self.hands = []
+        for cards, (x, y) in hands:
+            self.hands.append([(card, pygame.Rect(
+                (x + i % CARDS_PER_ROW * (CARD_SIZE[0] + HAND_GAP),
+                 y + i // CARDS_PER_ROW * ROW_OFFSET), CARD_SIZE))
+                for i, card in enumerate(cards)])
+        versions = []
+        for player, hand in enumerate(self.hands):
+            if player < len(previous) and previous[player] == hand:
+                versions.append(self.hand_versions[player])
+            else:
+                versions.append(self.updates)
+        self.hand_versions = versions
+        self._hand_indexes = [SpatialIndex([(rect, card) for card, rect in hand])
+                              for hand in self.hands]
+
+        # the table is the band between the hands above and below the middle of the screen
+        top, bottom = 0, screen_size[1]
+        for _, (x, y) in hands:
+            if y < screen_size[1] // 2:
+                top = max(top, y + CARD_SIZE[1])
+            else:
+                bottom = min(bottom, y)
+        self.table_area = pygame.Rect(0, top, screen_size[0], max(bottom - top, 0))
+
+        # attack cards are centered on the screen, defending cards lie on top of them
+        step = CARD_SIZE[0] + TABLE_GAP
+        first_x = screen_size[0] // 2 - (len(table) - 1) * step // 2
+        self.table = []
+        for i, (attack, defense) in enumerate(table):
+            attack_rect = pygame.Rect((0, 0), CARD_SIZE)
+            attack_rect.center = (first_x + i * step, screen_size[1] // 2)
+            defense_rect = None
+            if defense is not None:
+                defense_rect = attack_rect.move(0, DEFENSE_OFFSET)
+            self.table.append((attack, attack_rect, defense, defense_rect))
+        self._attack_index = SpatialIndex([(attack_rect, attack)
+                                           for attack, attack_rect, _, _ in self.table])
+
+    def hand_card_at(self, player, pos):  # topmost card of the player's hand at pos
+        return self._hand_indexes[player].at(pos)
+
+    def attack_card_at(self, pos):  # attack card on the table at pos
+        return self._attack_index.at(pos)
+
+    def on_table(self, player, pos):  # is pos on the table and not on the player's hand
+        return self.table_area.collidepoint(pos) and self.hand_card_at(player, pos) is None
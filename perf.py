@@ -0,0 +1,97 @@
+import json
+import time
+from collections import deque
+
+# frame timing for the game loop: every frame is split into named sections by mark(),
+# the last max_frames frames are kept for the overlay and for trace files that can be
+# opened in chrome://tracing or https://ui.perfetto.dev
+
+
+class FrameProfiler:
+    def __init__(self, max_frames=600):
+        self.frames = deque(maxlen=max_frames)  # (start, end, [(section, start, end)])
+        self._start = None
+        self._last = None
+        self._sections = []
+
+    def begin_frame(self):
+        self._start = self._last = time.perf_counter()
+        self._sections = []
+
+    def mark(self, section):  # the time since the last mark belongs to section
+        now = time.perf_counter()
+        self._sections.append((section, self._last, now))
+        self._last = now
+
+    def end_frame(self):
+        self.frames.append((self._start, self._last, self._sections))
+
+    def fps(self):  # frames that ended in the last second
+        if not self.frames:
+            return 0
+        last_end = self.frames[-1][1]
+        return sum(1 for _, end, _ in self.frames if end > last_end - 1.0)
+
+    def frame_time(self, fraction):  # frame time in seconds that fraction of the frames beat
+        times = sorted(end - start for start, end, _ in self.frames)
+        if not times:
+            return 0.0
+        return times[min(int(fraction * len(times)), len(times) - 1)]
+
+    def section_times(self):  # section -> mean seconds per frame
+        totals = {}
+        for _, _, sections in self.frames:
+            for section, start, end in sections:
+                totals[section] = totals.get(section, 0.0) + end - start
+        return {section: total / len(self.frames) for section, total in totals.items()}
+
+    def trace_events(self):  # Chrome trace-event format, times in microseconds
+        events = []
+        for number, (start, end, sections) in enumerate(self.frames):
+            events.append({"name": "frame", "ph": "X", "pid": 1, "tid": 1,
+                           "ts": start * 1000000, "dur": (end - start) * 1000000,
+                           "args": {"frame": number}})
+            events.extend({"name": section, "ph": "X", "pid": 1, "tid": 1,
+                           "ts": section_start * 1000000,
+                           "dur": (section_end - section_start) * 1000000}
+                          for section, section_start, section_end in sections)
+        return events
+
+    def save_trace(self, path):
+        with open(path, "w") as file:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, file)
+
+
+class PerfHud:  # overlay with the frame rate, frame times and where the time goes
+    refresh_interval = 0.25  # seconds between text updates, the text is rendered then
+
+    def __init__(self, profiler, font):
+        self.profiler = profiler
+        self.font = font
+        self.visible = False
+        self._lines = []
+        self._updated = 0.0
+
+    def toggle(self):
+        self.visible = not self.visible
+
+    def draw(self, surface, pos):
+        if not self.visible:
+            return
+        now = time.perf_counter()
+        if now - self._updated >= self.refresh_interval:
+            self._updated = now
+            profiler = self.profiler
+            sections = "  ".join(f"{section} {seconds * 1000:.2f}"
+                                 for section, seconds in profiler.section_times().items())
+            self._lines = [self.font.render(text, True, (255, 255, 0)) for text in (
+                f"FPS {profiler.fps()}   frame ms p50 {profiler.frame_time(0.5) * 1000:.1f}"
+                f"  p95 {profiler.frame_time(0.95) * 1000:.1f}"
+                f"  p99 {profiler.frame_time(0.99) * 1000:.1f}",
+                f"ms per frame: {sections}")]
+        x, y = pos
+        width = max((line.get_width() for line in self._lines), default=0)
+        surface.fill((0, 0, 0), (x - 5, y - 5, width + 10, 30 * len(self._lines) + 5))
+        for line in self._lines:
+            surface.blit(line, (x, y))
+            y += 30
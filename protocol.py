@@ -0,0 +1,168 @@
+import socket
+import struct
+import rules
+
+# messages between the game server and its clients. A message is its length (2 bytes,
+# big-endian) followed by the body, the first byte of the body is the message type.
+#
+# client to server:
+#   JOIN      table number (4 bytes), 0 joins any table that waits for a player,
+#             number of the rules profile
+#   MOVE      kind, card, target (NO_CARD for None)
+# server to client:
+#   SEATED    table number, seat
+#   VIEW      what the seat sees of the game, sent after every move of either player
+#   REJECTED  the move was not made: NOT_YOUR_TURN, ILLEGAL_MOVE, or not seated:
+#             TABLE_FULL, OTHER_RULES (the table plays another profile), BAD_RULES
+#   GAME_OVER winning seat, TIE_RESULT or LEFT_RESULT (the other player left)
+#
+# A view has the seat's hand and the table but only the number of cards in the other
+# hand and in the deck, hidden cards never leave the server.
+
+JOIN = 1
+MOVE = 2
+SEATED = 3
+VIEW = 4
+REJECTED = 5
+GAME_OVER = 6
+
+NOT_YOUR_TURN = 1
+ILLEGAL_MOVE = 2
+TABLE_FULL = 3
+OTHER_RULES = 4
+BAD_RULES = 5  # unknown profile, or not for two players
+
+TIE_RESULT = 0xFE
+LEFT_RESULT = 0xFD
+NO_CARD = 0xFF
+
+LENGTH = struct.Struct(">H")
+JOIN_BODY = struct.Struct(">BIB")
+MOVE_BODY = struct.Struct(">BBBB")
+SEATED_BODY = struct.Struct(">BIB")
+# type, seat, flags, trump, cards in the deck, in the other hand, table pairs,
+# hand and discard masks
+VIEW_HEADER = struct.Struct(">BBBBBBBQQ")
+REASON_BODY = struct.Struct(">BB")  # REJECTED and GAME_OVER
+
+TRUMP_TAKEN = 1  # flag bits, same as in savefile
+DEFENDER = 2
+TURN = 4
+PROFILE_SHIFT = 3
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def frame(body):
+    return LENGTH.pack(len(body)) + body
+
+
+def encode_join(table=0, profile=rules.CLASSIC):
+    return frame(JOIN_BODY.pack(JOIN, table, profile.number))
+
+
+def encode_move(move):
+    kind, card, target = move
+    return frame(MOVE_BODY.pack(MOVE, kind, NO_CARD if card is None else card,
+                                NO_CARD if target is None else target))
+
+
+def encode_seated(table, seat):
+    return frame(SEATED_BODY.pack(SEATED, table, seat))
+
+
+def encode_rejected(reason):
+    return frame(REASON_BODY.pack(REJECTED, reason))
+
+
+def encode_game_over(result):
+    if result == rules.TIE:
+        result = TIE_RESULT
+    return frame(REASON_BODY.pack(GAME_OVER, result))
+
+
+def encode_view(state, seat):
+    flags = (TRUMP_TAKEN if state.trump_taken else 0) | \
+        (DEFENDER if state.defender else 0) | (TURN if state.turn else 0) | \
+        state.profile.number << PROFILE_SHIFT
+    table = bytearray()
+    for attack, defense in state.table:
+        table.append(attack)
+        table.append(NO_CARD if defense is None else defense)
+    return frame(VIEW_HEADER.pack(VIEW, seat, flags, state.trump, len(state.deck),
+                                  rules.count(state.hands[1 - seat]), len(state.table),
+                                  state.hands[seat], state.discard) + table)
+
+
+def decode_move(body):
+    if len(body) != MOVE_BODY.size:
+        raise ProtocolError("Bad move message")
+    _, kind, card, target = MOVE_BODY.unpack(body)
+    if kind > rules.TRANSFER or card != NO_CARD and card >= rules.NUM_CARDS or \
+            target != NO_CARD and target >= rules.NUM_CARDS:
+        raise ProtocolError("Bad move message")
+    return (kind, None if card == NO_CARD else card, None if target == NO_CARD else target)
+
+
+def decode_view(body):  # returns (seat, state)
+    # the other hand and the deck are filled with stand-in cards the seat has not seen,
+    # so the state can be shown and checked like a local one
+    if len(body) < VIEW_HEADER.size:
+        raise ProtocolError("Bad view message")
+    _, seat, flags, trump, deck_size, other_size, table_size, hand, discard = \
+        VIEW_HEADER.unpack_from(body)
+    cards = body[VIEW_HEADER.size:]
+    if len(cards) != 2 * table_size or flags >> PROFILE_SHIFT >= len(rules.PROFILES):
+        raise ProtocolError("Bad view message")
+    table = tuple((cards[i], None if cards[i + 1] == NO_CARD else cards[i + 1])
+                  for i in range(0, len(cards), 2))
+    state = rules.GameState((), trump, bool(flags & TRUMP_TAKEN), (hand, hand), table,
+                            1 if flags & DEFENDER else 0, 1 if flags & TURN else 0, discard,
+                            profile=rules.PROFILES[flags >> PROFILE_SHIFT])
+    unseen = list(rules.cards_of(state.unseen(seat)))
+    hands = [hand, hand]
+    hands[1 - seat] = rules.mask_of(unseen[:other_size])
+    return seat, state._replace(deck=tuple(unseen[other_size:other_size + deck_size]),
+                                hands=tuple(hands))
+
+
+class Connection:  # client side, polled from the game loop and never blocks it
+    def __init__(self, host, port):
+        self.socket = socket.create_connection((host, port))
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.socket.setblocking(False)
+        self._buffer = bytearray()
+        self.closed = False
+
+    def send(self, message):
+        self.socket.setblocking(True)  # messages are tiny, this returns at once
+        try:
+            self.socket.sendall(message)
+        finally:
+            self.socket.setblocking(False)
+
+    def receive(self):  # bodies of the messages that arrived since the last call
+        while not self.closed:
+            try:
+                data = self.socket.recv(65536)
+            except BlockingIOError:
+                break
+            except OSError:  # connection reset
+                data = b""
+            if not data:
+                self.closed = True
+            self._buffer += data
+        messages = []
+        while len(self._buffer) >= LENGTH.size:
+            length, = LENGTH.unpack_from(self._buffer)
+            if len(self._buffer) < LENGTH.size + length:
+                break
+            messages.append(bytes(self._buffer[LENGTH.size:LENGTH.size + length]))
+            del self._buffer[:LENGTH.size + length]
+        return messages
+
+    def close(self):
+        self.socket.close()
+        self.closed = True
@@ -0,0 +1,166 @@
+import pygame
+import instrument
+
+# the frame is recorded as a Scene of surfaces and fills. Hands and the deck are Layers,
+# composed off screen when the game state changes and drawn with one blit each, the
+# table cards are sprites that go to the screen in one blits call.
+
+
+class Scene:  # records what a frame draws instead of drawing it, used in place of the screen
+    def __init__(self, size):
+        self._size = size
+        self.items = []  # (surface or fill color, rect) in drawing order
+
+    def get_size(self):
+        return self._size
+
+    def get_width(self):
+        return self._size[0]
+
+    def get_height(self):
+        return self._size[1]
+
+    def blit(self, surface, pos):
+        self.items.append((surface, pygame.Rect(pos, surface.get_size())))
+
+    def blits(self, sequence):  # (surface, pos) pairs, like Surface.blits
+        self.items.extend((surface, pygame.Rect(pos, surface.get_size()))
+                          for surface, pos in sequence)
+
+    def fill(self, color, rect):
+        self.items.append((tuple(color), pygame.Rect(rect)))
+
+
+class Layer:  # cards that only change with the game state, composed off screen
+    def __init__(self):
+        self.key = None  # the layer is composed again when the key changes
+        self.surface = None
+        self.pos = None
+        self._background = None
+
+    def draw(self, surface, key, sprites, background=None):
+        # sprites() - (surface, rect) from bottom to top, only called for a new key.
+        # With the screen background the layer is opaque, it starts as a copy of the
+        # background below it and is drawn without blending
+        if key != self.key or background is not self._background:
+            self.key = key
+            self._background = background
+            self.surface = None
+            sprites = sprites()
+            if sprites:
+                bounds = sprites[0][1].unionall([rect for _, rect in sprites])
+                if background is not None:
+                    bounds = bounds.clip(background.get_rect())
+                if bounds.width and bounds.height:
+                    self.pos = bounds.topleft
+                    if background is None:
+                        self.surface = pygame.Surface(bounds.size, pygame.SRCALPHA)
+                    else:
+                        self.surface = background.subsurface(bounds).copy()
+                    self.surface.blits([(sprite, rect.move(-bounds.x, -bounds.y))
+                                        for sprite, rect in sprites], doreturn=False)
+        if self.surface is not None:  # one blit, on the screen or in a Scene
+            surface.blit(self.surface, self.pos)
+
+
+class DirtyRenderer:  # redraws and pushes only the parts of the screen that changed
+    full_redraw_ratio = 0.5  # share of the screen above which everything is redrawn
+    max_rects = 32
+
+    def __init__(self, screen, background):
+        self.screen = screen
+        self.background = background
+        self._previous = []  # items of the last frame, kept alive so their ids stay unique
+        self._full_redraw = True
+
+    def begin_frame(self):
+        return Scene(self.screen.get_size())
+
+    def invalidate(self):  # next frame redraws the whole screen (window exposed, resized...)
+        self._full_redraw = True
+
+    @instrument.probe()
+    def render(self, scene):  # returns the rects that were updated
+        items = scene.items
+        dirty = None
+        if not self._full_redraw:
+            dirty = self._dirty_rects(items)
+            if self._too_large(dirty):
+                dirty = None
+
+        if dirty is None:
+            self._draw(items, None)
+            pygame.display.update()
+            dirty = [self.screen.get_rect()]
+        elif dirty:
+            for rect in dirty:
+                self._draw(items, rect)
+            pygame.display.update(dirty)
+
+        self._previous = items
+        self._full_redraw = False
+        return dirty
+
+    @staticmethod
+    def _key(item):  # surfaces are shared and never changed in place, so identity is enough
+        source, rect = item
+        return (source if isinstance(source, tuple) else id(source), tuple(rect))
+
+    def _dirty_rects(self, items):
+        previous = {self._key(item): item[1] for item in self._previous}
+        current = {self._key(item): item[1] for item in items}
+        rects = [rect for key, rect in previous.items() if key not in current]
+        rects += [rect for key, rect in current.items() if key not in previous]
+
+        # items that stayed but are now drawn in a different order
+        kept_before = [key for key in previous if key in current]
+        kept_now = [key for key in current if key in previous]
+        for before, now in zip(kept_before, kept_now):
+            if before != now:
+                rects += [previous[before], current[now]]
+
+        return self._merge(rects)
+
+    def _merge(self, rects):  # clip to the screen and join overlapping rects
+        screen_rect = self.screen.get_rect()
+        merged = []
+        for rect in rects:
+            rect = rect.clip(screen_rect)
+            if rect.width == 0 or rect.height == 0:
+                continue
+            i = 0
+            while i < len(merged):
+                if merged[i].colliderect(rect):
+                    rect = rect.union(merged.pop(i))
+                    i = 0
+                else:
+                    i += 1
+            merged.append(rect)
+        return merged
+
+    def _too_large(self, rects):
+        if len(rects) > self.max_rects:
+            return True
+        area = sum(rect.width * rect.height for rect in rects)
+        return area > self.full_redraw_ratio * self.screen.get_width() * self.screen.get_height()
+
+    def _draw(self, items, clip):  # draw every item touching clip (or all of them)
+        screen = self.screen
+        screen.set_clip(clip)
+        if clip is None:
+            screen.blit(self.background, (0, 0))
+        else:
+            screen.blit(self.background, clip, clip)
+        batch = []  # surfaces between two fills go to the screen in one blits call
+        for source, rect in items:
+            if clip is None or rect.colliderect(clip):
+                if isinstance(source, tuple):
+                    if batch:
+                        screen.blits(batch, doreturn=False)
+                        batch = []
+                    screen.fill(source, rect)
+                else:
+                    batch.append((source, rect))
+        if batch:
+            screen.blits(batch, doreturn=False)
+        screen.set_clip(None)
@@ -0,0 +1,149 @@
+import os
+import struct
+import rules
+import savefile
+
+# replay archives: whole games one after another, every game with a keyframe (a savefile
+# encoding of the full game) every keyframe_every moves, so any move can be shown by
+# loading the keyframe before it and playing at most keyframe_every - 1 moves.
+#
+#   archive: MAGIC, version, then game records
+#   game record: header, moves (3 bytes each), keyframe offsets, keyframes
+#   keyframe: length of the saved game, saved game
+#
+# Only the headers are read to find a game, a game only reads what a seek needs.
+
+MAGIC = b"DRKR"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sB")
+GAME_HEADER = struct.Struct("<IHHH")  # record size, moves, keyframe_every, keyframes
+MOVE = struct.Struct("<BBB")  # kind, card, target
+OFFSET = struct.Struct("<I")  # keyframe position from the start of the game record
+KEYFRAME = struct.Struct("<H")  # size of the saved game that follows
+NO_CARD = savefile.NO_CARD
+
+
+class ReplayError(ValueError):
+    pass
+
+
+def encode_move(move):
+    kind, card, target = move
+    return MOVE.pack(kind, NO_CARD if card is None else card,
+                     NO_CARD if target is None else target)
+
+
+def decode_moves(data):
+    return [(kind, None if card == NO_CARD else card, None if target == NO_CARD else target)
+            for kind, card, target in MOVE.iter_unpack(data)]
+
+
+class ReplayWriter:  # records games and appends every finished game to the archive
+    def __init__(self, path, keyframe_every=32):
+        self.path = path
+        self.keyframe_every = keyframe_every
+        self._moves = []
+        self._keyframes = []  # encoded keyframes, one every keyframe_every moves
+
+    def begin(self, state, hands):  # start recording a game, an unfinished one is dropped
+        self._moves = []
+        self._keyframes = [savefile.encode(state, hands)]
+
+    def record(self, move):  # returns True when the state after the move is a keyframe
+        self._moves.append(encode_move(move))
+        return len(self._moves) % self.keyframe_every == 0
+
+    def keyframe(self, state, hands):
+        self._keyframes.append(savefile.encode(state, hands))
+
+    def finish(self):  # append the recorded game to the archive
+        if not self._keyframes:
+            return
+        moves = b"".join(self._moves)
+        offset = GAME_HEADER.size + len(moves) + OFFSET.size * len(self._keyframes)
+        offsets = []
+        for data in self._keyframes:
+            offsets.append(OFFSET.pack(offset))
+            offset += KEYFRAME.size + len(data)
+        record = GAME_HEADER.pack(offset, len(self._moves), self.keyframe_every,
+                                  len(self._keyframes)) + moves + b"".join(offsets) + \
+            b"".join(KEYFRAME.pack(len(data)) + data for data in self._keyframes)
+
+        new_file = not os.path.exists(self.path)
+        with open(self.path, "ab") as file:
+            if new_file:
+                file.write(FILE_HEADER.pack(MAGIC, VERSION))
+            file.write(record)
+        self._moves = []
+        self._keyframes = []
+
+
+class Replay:  # one game of an archive, read on demand
+    def __init__(self, file, offset):
+        self._file = file
+        self.offset = offset
+        file.seek(offset)
+        self.size, self.num_moves, self.keyframe_every, self.num_keyframes = \
+            GAME_HEADER.unpack(file.read(GAME_HEADER.size))
+
+    def _read(self, position, size):
+        self._file.seek(self.offset + position)
+        data = self._file.read(size)
+        if len(data) != size:
+            raise ReplayError("The replay is cut off")
+        return data
+
+    def moves(self, start, stop):  # moves number start to stop - 1
+        return decode_moves(self._read(GAME_HEADER.size + MOVE.size * start,
+                                       MOVE.size * (stop - start)))
+
+    def keyframe_before(self, move):
+        # returns (keyframe state, its hands, the moves from it to the move with that number)
+        move = max(0, min(move, self.num_moves))
+        index = min(move // self.keyframe_every, self.num_keyframes - 1)
+        offset = OFFSET.unpack(self._read(GAME_HEADER.size + MOVE.size * self.num_moves +
+                                          OFFSET.size * index, OFFSET.size))[0]
+        size = KEYFRAME.unpack(self._read(offset, KEYFRAME.size))[0]
+        state, hands = savefile.decode(self._read(offset + KEYFRAME.size, size))
+        return state, hands, self.moves(index * self.keyframe_every, move)
+
+    def state_at(self, move):  # the state before the move with that number is made
+        state, hands, moves = self.keyframe_before(move)
+        for played in moves:
+            state = rules.apply(state, played, validate=False)
+        return state
+
+
+class ReplayArchive:  # every game of an archive file, opened without reading it
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        header = self._file.read(FILE_HEADER.size)
+        if len(header) != FILE_HEADER.size or FILE_HEADER.unpack(header) != (MAGIC, VERSION):
+            self._file.close()
+            raise ReplayError(f"{path} is not a replay archive")
+        self._offsets = []  # where every game found so far starts
+        self._end = FILE_HEADER.size  # where the next unknown game starts
+        self._file_size = os.fstat(self._file.fileno()).st_size
+
+    def _find(self, index):  # reads game headers until the game with that index is found
+        while len(self._offsets) <= index and \
+                self._end + GAME_HEADER.size <= self._file_size:
+            self._file.seek(self._end)
+            size = GAME_HEADER.unpack(self._file.read(GAME_HEADER.size))[0]
+            if size < GAME_HEADER.size:
+                raise ReplayError("The replay archive is damaged")
+            self._offsets.append(self._end)
+            self._end += size
+        return index < len(self._offsets)
+
+    def __len__(self):
+        self._find(self._file_size)  # more games than bytes is impossible
+        return len(self._offsets)
+
+    def game(self, index):
+        if index < 0 or not self._find(index):
+            raise IndexError("No game with that number in the archive")
+        return Replay(self._file, self._offsets[index])
+
+    def close(self):
+        self._file.close()
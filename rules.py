@@ -0,0 +1,426 @@
+import random
+from collections import namedtuple
+
+# display-free rules of the game. Cards are small integers, the game state is an
+# immutable GameState and every action goes through legal_moves / apply, so this
+# module can be imported by servers, bots and tests without pygame
+
+RANKS = ("2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K", "A")
+SUITS = ("spades", "diamonds", "clubs", "hearts")
+NUM_CARDS = len(RANKS) * len(SUITS)
+HAND_SIZE = 6
+
+# move kinds, a move is always a (kind, card, target) tuple
+ATTACK = 0  # attacker puts a card on the table (first card or a throw-in)
+DEFEND = 1  # defender beats the target card on the table with card
+PASS = 2  # "Next turn" - give the turn to the other player
+END_ROUND = 3  # attacker ends the round after all cards were beaten
+TAKE = 4  # defender takes all the cards from the table
+TRANSFER = 5  # perevodnoy: defender passes the attack on with a card of the same rank
+
+TIE = -1  # result of winner() when every player got rid of their cards
+
+
+def card_id(rank, suit):  # same order as Cards.create_cards
+    return RANKS.index(rank) * len(SUITS) + SUITS.index(suit)
+
+
+def rank_of(card):
+    return card // len(SUITS)
+
+
+def suit_of(card):
+    return card % len(SUITS)
+
+
+def card_name(card):
+    return f"{RANKS[rank_of(card)]} of {SUITS[suit_of(card)]}"
+
+
+# sets of cards are NUM_CARDS-bit integers, card c is bit (1 << c)
+FULL_MASK = (1 << NUM_CARDS) - 1
+RANK_MASKS = tuple(sum(1 << (rank * len(SUITS) + suit) for suit in range(len(SUITS)))
+                   for rank in range(len(RANKS)))
+SUIT_MASKS = tuple(sum(1 << (rank * len(SUITS) + suit) for rank in range(len(RANKS)))
+                   for suit in range(len(SUITS)))
+SAME_RANK = tuple(RANK_MASKS[rank_of(card)] for card in range(NUM_CARDS))
+# BEATS[trump suit][card] - every card that beats card under that trump
+BEATS = tuple(tuple(
+    sum(1 << other for other in range(NUM_CARDS)
+        if suit_of(other) == suit_of(card) and rank_of(other) > rank_of(card))
+    | (SUIT_MASKS[trump_suit] if suit_of(card) != trump_suit else 0)
+    for card in range(NUM_CARDS)) for trump_suit in range(len(SUITS)))
+
+
+def mask_of(cards):
+    mask = 0
+    for card in cards:
+        mask |= 1 << card
+    return mask
+
+
+def cards_of(mask):  # cards in the set, lowest id first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def count(mask):
+    return bin(mask).count("1")
+
+
+def beats(card, attack_card, trump_suit):  # can card beat attack_card?
+    return BEATS[trump_suit][attack_card] >> card & 1 == 1
+
+
+class Profile:  # a variant of the rules, compiled into lookup tables once
+    def __init__(self, name, deck_size=NUM_CARDS, players=2, hand_size=HAND_SIZE,
+                 transfer=False, max_attacks=None, defender_hand_limit=False):
+        # deck_size - 52, or 36 for six to ace, transfer - perevodnoy Durak,
+        # max_attacks - attack cards in one round (None - no limit),
+        # defender_hand_limit - never more undefended cards than the defender holds
+        if deck_size not in (36, NUM_CARDS) or not 2 <= players <= 6 or \
+                players * hand_size > deck_size:
+            raise ValueError(f"Unsupported rules {name}")
+        self.name = name
+        self.number = None  # index in PROFILES, stored in saves and messages
+        self.players = players
+        self.hand_size = hand_size
+        self.transfer = transfer
+        self.max_attacks = max_attacks
+        self.defender_hand_limit = defender_hand_limit
+        self.limited = max_attacks is not None or defender_hand_limit
+        lowest_rank = len(RANKS) - deck_size // len(SUITS)
+        self.cards = tuple(range(lowest_rank * len(SUITS), NUM_CARDS))
+        self.deck_mask = mask_of(self.cards)
+        # beats[trump suit][card] - cards of this deck that beat card
+        self.beats = tuple(tuple(row[card] & self.deck_mask for card in range(NUM_CARDS))
+                           for row in BEATS)
+
+    def __repr__(self):
+        return f"Profile({self.name!r})"
+
+
+CLASSIC = Profile("classic")  # the rules of the game window
+PROFILES = (
+    CLASSIC,
+    Profile("podkidnoy-36", deck_size=36, max_attacks=6, defender_hand_limit=True),
+    Profile("perevodnoy-36", deck_size=36, transfer=True, max_attacks=6,
+            defender_hand_limit=True),
+    Profile("perevodnoy-52", transfer=True, defender_hand_limit=True),
+) + tuple(Profile(f"podkidnoy-36-{players}p", deck_size=36, players=players, max_attacks=6,
+                  defender_hand_limit=True) for players in range(3, 7))
+for number, profile in enumerate(PROFILES):
+    profile.number = number
+
+
+def get_profile(name):
+    for profile in PROFILES:
+        if profile.name == name:
+            return profile
+    raise ValueError(f"Unknown rules {name}, choose from "
+                     + ", ".join(profile.name for profile in PROFILES))
+
+
+class GameState(namedtuple("GameState", ("deck", "trump", "trump_taken", "hands", "table",
+                                           "defender", "turn", "discard", "lead", "profile"),
+                           defaults=(0, None, CLASSIC))):
+    # deck - tuple of cards left in the deck, drawn from the front
+    # trump - trump card, the last card to be drawn
+    # hands - tuple of card masks, one for every player
+    # table - tuple of (attack card, defending card or None)
+    # defender - index of the defending player, turn - index of the player to move
+    # discard - mask of the cards beaten in earlier rounds
+    # lead - the main attacker when more than two play, other attackers may throw in
+    # profile - the rules that are played
+    __slots__ = ()
+
+    @property
+    def attacker(self):
+        return 1 - self.defender if self.lead is None else self.lead
+
+    @property
+    def trump_suit(self):
+        return suit_of(self.trump)
+
+    def undefended(self):  # attack cards on the table that were not beaten yet
+        return [attack for attack, defense in self.table if defense is None]
+
+    def table_mask(self):
+        mask = 0
+        for attack, defense in self.table:
+            mask |= 1 << attack
+            if defense is not None:
+                mask |= 1 << defense
+        return mask
+
+    def throw_in_mask(self):  # cards whose rank is already on the table
+        mask = 0
+        for attack, defense in self.table:
+            mask |= SAME_RANK[attack]
+            if defense is not None:
+                mask |= SAME_RANK[defense]
+        return mask
+
+    def unseen(self, player):  # cards the player cannot see: opponent's hand and the deck
+        known = self.hands[player] | self.table_mask() | self.discard
+        if not self.trump_taken and self.trump is not None:
+            known |= 1 << self.trump
+        return self.profile.deck_mask & ~known
+
+    def deck_empty(self):  # no cards left to draw, trump card included
+        return not self.deck and (self.trump_taken or self.trump is None)
+
+
+def stream(seed, index):  # independent, reproducible random stream number index
+    return random.Random(f"{seed}:{index}")
+
+
+def replay_game(seed, moves, index=0, profile=CLASSIC):
+    # the state after moves in the game dealt by a stream
+    state = new_game(stream(seed, index), profile)
+    for move in moves:
+        state = apply(state, move)
+    return state
+
+
+def new_game(rng=random, profile=CLASSIC):  # shuffle, turn up the trump card and deal
+    cards = list(profile.cards)
+    rng.shuffle(cards)
+    lead = None if profile.players == 2 else 0
+    state = GameState(tuple(cards[1:]), cards[0], False, (0,) * profile.players, (), 1, 0, 0,
+                      lead, profile)
+    return _refill(state)
+
+
+def _draw(state, player, num_cards):  # draw num_cards from the deck into the player's hand
+    drawn = mask_of(state.deck[:num_cards])
+    trump_taken = state.trump_taken
+    if num_cards > len(state.deck) and not trump_taken and state.trump is not None:
+        drawn |= 1 << state.trump
+        trump_taken = True
+    hands = list(state.hands)
+    hands[player] |= drawn
+    return state._replace(deck=state.deck[num_cards:], trump_taken=trump_taken, hands=tuple(hands))
+
+
+def _refill(state):  # every player draws up to the hand size
+    hand_size = state.profile.hand_size
+    for player in range(len(state.hands)):
+        missing = hand_size - count(state.hands[player])
+        if missing > 0 and not state.deck_empty():
+            state = _draw(state, player, missing)
+    return state
+
+
+def _next_player(state, player):  # the next player after player who still has cards
+    players = len(state.hands)
+    for step in range(1, players):
+        other = (player + step) % players
+        if players == 2 or state.hands[other] or not state.deck_empty():
+            return other
+    return (player + 1) % players
+
+
+def _next_attacker(state):  # the next player who may still throw in, None ends the round
+    players = len(state.hands)
+    player = state.turn
+    while True:
+        player = (player + 1) % players
+        if player == state.lead:
+            return None
+        if player != state.defender and state.hands[player]:
+            return player
+
+
+def _may_attack(state, undefended):  # is there room for one more attack card this round?
+    profile = state.profile
+    if profile.max_attacks is not None and len(state.table) >= profile.max_attacks:
+        return False
+    return not profile.defender_hand_limit or undefended < count(state.hands[state.defender])
+
+
+def _transfer_mask(state):  # cards the defender can pass the attack on with
+    table = state.table
+    if not table or any(defense is not None for _, defense in table):
+        return 0
+    profile = state.profile
+    if profile.max_attacks is not None and len(table) >= profile.max_attacks:
+        return 0
+    if count(state.hands[_next_player(state, state.defender)]) <= len(table):
+        return 0  # the next defender could not beat them all
+    return SAME_RANK[table[0][0]]
+
+
+def legal_moves(state):
+    if winner(state) is not None:
+        return []
+
+    moves = []
+    profile = state.profile
+    hand = state.hands[state.turn]
+    undefended = state.undefended()
+
+    if state.turn != state.defender:
+        if not profile.limited or _may_attack(state, len(undefended)):
+            if not state.table:
+                moves.extend((ATTACK, card, None) for card in cards_of(hand))
+            else:
+                moves.extend((ATTACK, card, None)
+                             for card in cards_of(hand & state.throw_in_mask()))
+        if undefended:
+            moves.append((PASS, None, None))
+        elif state.table:
+            moves.append((END_ROUND, None, None))
+    else:
+        beats_mask = profile.beats[state.trump_suit]
+        for attack in undefended:
+            moves.extend((DEFEND, card, attack) for card in cards_of(hand & beats_mask[attack]))
+        if profile.transfer:
+            moves.extend((TRANSFER, card, None) for card in cards_of(hand & _transfer_mask(state)))
+        if undefended:
+            moves.append((TAKE, None, None))
+        elif state.table:
+            moves.append((PASS, None, None))
+
+    return moves
+
+
+def is_legal(state, move):
+    kind, card, target = move
+    profile = state.profile
+    hand = state.hands[state.turn]
+    is_attacker = state.turn != state.defender
+
+    if winner(state) is not None:
+        return False
+    if kind == ATTACK:
+        return is_attacker and hand >> card & 1 == 1 and (
+            not state.table or state.throw_in_mask() >> card & 1 == 1) and (
+            not profile.limited or _may_attack(state, len(state.undefended())))
+    if kind == DEFEND:
+        return not is_attacker and hand >> card & 1 == 1 and target in state.undefended() and \
+            profile.beats[state.trump_suit][target] >> card & 1 == 1
+    if kind == TRANSFER:
+        return profile.transfer and not is_attacker and hand >> card & 1 == 1 and \
+            _transfer_mask(state) >> card & 1 == 1
+    if kind == PASS:
+        if is_attacker:
+            return bool(state.undefended())
+        return bool(state.table) and not state.undefended()
+    if kind == END_ROUND:
+        return is_attacker and bool(state.table) and not state.undefended()
+    if kind == TAKE:
+        return not is_attacker and bool(state.undefended())
+    return False
+
+
+def apply(state, move, validate=True):  # returns the state after the move, state is not changed
+    if validate and not is_legal(state, move):
+        raise ValueError(f"Illegal move {move!r}")
+
+    kind, card, target = move
+    hands = list(state.hands)
+
+    if kind == ATTACK:
+        hands[state.turn] &= ~(1 << card)
+        return state._replace(hands=tuple(hands), table=state.table + ((card, None),))
+
+    if kind == DEFEND:
+        hands[state.turn] &= ~(1 << card)
+        table = tuple((attack, card if attack == target else defense)
+                      for attack, defense in state.table)
+        return state._replace(hands=tuple(hands), table=table)
+
+    if kind == TRANSFER:  # the defender attacks the next player with the cards on the table
+        hands[state.turn] &= ~(1 << card)
+        defender = _next_player(state, state.defender)
+        return state._replace(hands=tuple(hands), table=state.table + ((card, None),),
+                              defender=defender, turn=defender,
+                              lead=None if state.lead is None else state.defender)
+
+    if kind == PASS:  # the defender gives the turn back to the main attacker
+        return state._replace(turn=state.attacker if state.turn == state.defender
+                              else state.defender)
+
+    if kind == END_ROUND:  # all cards beaten, the defender attacks in the next round
+        if state.lead is not None and _may_attack(state, 0):
+            attacker = _next_attacker(state)
+            if attacker is not None:  # other players may throw in first
+                return state._replace(turn=attacker)
+        state = _refill(state._replace(table=(), discard=state.discard | state.table_mask()))
+        lead = state.defender
+        if state.lead is not None and not state.hands[lead]:
+            lead = _next_player(state, lead)
+    else:  # TAKE - the defender picks up every card on the table and is skipped
+        hands[state.defender] |= state.table_mask()
+        state = _refill(state._replace(hands=tuple(hands), table=()))
+        lead = _next_player(state, state.defender)
+    defender = _next_player(state, lead)
+    return state._replace(defender=defender, turn=lead,
+                          lead=None if state.lead is None else lead)
+
+
+def winner(state):  # None while the game goes on, otherwise the winner's index or TIE
+    # with more than two players everybody but the durak wins, the first of them is given
+    if state.table or not state.deck_empty():
+        return None
+    empty = [player for player, hand in enumerate(state.hands) if not hand]
+    if len(empty) < len(state.hands) - 1:
+        return None
+    if len(empty) == len(state.hands):
+        return TIE
+    return empty[0]
+
+
+def loser(state):  # None while the game goes on, otherwise the durak's index or TIE
+    result = winner(state)
+    if result is None or result == TIE:
+        return result
+    return next(player for player, hand in enumerate(state.hands) if hand)
+
+
+class RoundStatus:  # counts of the current round, kept up to date move by move
+    __slots__ = ("played", "defended", "turn", "defender", "result")
+
+    def __init__(self, state):
+        self.played = len(state.table)  # attack cards on the table
+        self.defended = sum(1 for _, defense in state.table if defense is not None)
+        self.turn = state.turn
+        self.defender = state.defender
+        self.result = winner(state)  # can only change when a round ends
+
+    @property
+    def undefended(self):
+        return self.played - self.defended
+
+    def update(self, move, new_state):  # new_state - the state after move
+        kind = move[0]
+        if kind == ATTACK:
+            self.played += 1
+        elif kind == DEFEND:
+            self.defended += 1
+        elif kind == PASS:
+            self.turn = new_state.turn
+        else:  # the round is over and the table is empty again, or the attack moved on
+            self.__init__(new_state)
+
+    def allows(self, kind):  # same as is_legal for PASS, END_ROUND and TAKE moves
+        if self.result is not None:
+            return False
+        attacking = self.turn != self.defender
+        if kind == PASS:
+            if attacking:
+                return self.undefended > 0
+            return self.played > 0 and self.undefended == 0
+        if kind == END_ROUND:
+            return attacking and self.played > 0 and self.undefended == 0
+        if kind == TAKE:
+            return not attacking and self.undefended > 0
+        return False
+
+
+def step(state, move):  # apply a move and report the result: (new state, winner or None)
+    state = apply(state, move)
+    return state, winner(state)
@@ -0,0 +1,156 @@
+import os
+import re
+import struct
+import zlib
+import rules
+
+# binary save games. A save is a header, one byte per card and a CRC-32 of everything
+# before it:
+#   magic, version, flags (trump taken, defender, turn, rules profile), trump card,
+#   number of cards in the deck, in hand 1, in hand 2 and pairs on the table
+#   deck cards in drawing order, hand cards in the order they are shown,
+#   table pairs (attack card, defending card or NO_CARD)
+# The discard pile is not stored, it is every card that is not in play.
+
+MAGIC = b"DURK"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBBBBB")
+CHECKSUM = struct.Struct("<I")
+NO_CARD = 0xFF
+
+TRUMP_TAKEN = 1  # flag bits
+DEFENDER = 2  # player 2 defends
+TURN = 4  # player 2 moves
+PROFILE_SHIFT = 3  # the higher bits are the number of the rules profile, 0 for classic
+
+
+class SaveError(ValueError):  # the file is not a save game this version can read
+    pass
+
+
+def encode(state, hands=None):  # hands - card ids of every hand in display order
+    if len(state.hands) != 2:
+        raise SaveError("Only two player games can be saved")
+    if hands is None:
+        hands = [list(rules.cards_of(hand)) for hand in state.hands]
+    flags = (TRUMP_TAKEN if state.trump_taken else 0) | \
+        (DEFENDER if state.defender else 0) | (TURN if state.turn else 0) | \
+        state.profile.number << PROFILE_SHIFT
+    table = []
+    for attack, defense in state.table:
+        table.append(attack)
+        table.append(NO_CARD if defense is None else defense)
+    data = HEADER.pack(MAGIC, VERSION, flags, state.trump, len(state.deck),
+                       len(hands[0]), len(hands[1]), len(state.table)) + \
+        bytes(state.deck) + bytes(hands[0]) + bytes(hands[1]) + bytes(table)
+    return data + CHECKSUM.pack(zlib.crc32(data))
+
+
+def decode(data):  # returns (state, hands), the opposite of encode
+    if len(data) < HEADER.size + CHECKSUM.size or data[:len(MAGIC)] != MAGIC:
+        raise SaveError("Not a saved game")
+    magic, version, flags, trump, deck_size, hand1_size, hand2_size, table_size = \
+        HEADER.unpack_from(data)
+    if version != VERSION:
+        raise SaveError(f"Saved game version {version} is not supported")
+    end = HEADER.size + deck_size + hand1_size + hand2_size + 2 * table_size
+    if len(data) != end + CHECKSUM.size or \
+            CHECKSUM.unpack_from(data, end)[0] != zlib.crc32(data[:end]):
+        raise SaveError("The saved game is damaged")
+    profile_number = flags >> PROFILE_SHIFT
+    if profile_number >= len(rules.PROFILES) or rules.PROFILES[profile_number].players != 2:
+        raise SaveError("The saved game has unknown rules")
+
+    position = HEADER.size
+    deck = tuple(data[position:position + deck_size])
+    position += deck_size
+    hands = (tuple(data[position:position + hand1_size]),
+             tuple(data[position + hand1_size:position + hand1_size + hand2_size]))
+    position += hand1_size + hand2_size
+    pairs = data[position:end]
+    table = tuple((pairs[i], None if pairs[i + 1] == NO_CARD else pairs[i + 1])
+                  for i in range(0, len(pairs), 2))
+
+    state = rules.GameState(deck, trump, bool(flags & TRUMP_TAKEN),
+                            (rules.mask_of(hands[0]), rules.mask_of(hands[1])), table,
+                            1 if flags & DEFENDER else 0, 1 if flags & TURN else 0,
+                            profile=rules.PROFILES[profile_number])
+    return with_discard(state), hands
+
+
+def with_discard(state):  # every card that is not in play anymore was beaten earlier
+    cards = list(state.deck) + \
+        [card for pair in state.table for card in pair if card is not None]
+    for hand in state.hands:
+        cards.extend(rules.cards_of(hand))
+    if not state.trump_taken:
+        cards.append(state.trump)
+    deck_mask = state.profile.deck_mask
+    if deck_mask >> state.trump & 1 == 0 or \
+            any(card >= rules.NUM_CARDS or deck_mask >> card & 1 == 0 for card in cards) or \
+            len(set(cards)) != len(cards):
+        raise SaveError("The saved game has invalid cards")
+    in_play = state.hands[0] | state.hands[1] | state.table_mask() | rules.mask_of(state.deck)
+    if not state.trump_taken:
+        in_play |= 1 << state.trump
+    return state._replace(discard=deck_mask & ~in_play)
+
+
+def save(path, state, hands=None):  # the old file stays intact until the new one is written
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        file.write(encode(state, hands))
+    os.replace(temporary, path)
+
+
+def load(path):  # returns (state, hands)
+    with open(path, "rb") as file:
+        return decode(file.read())
+
+
+# the text format of earlier versions, read without executing it
+_TEXT_CARD = re.compile(r"Card\('(\w+)', '(\w+)'\)|None")
+
+
+def _text_cards(value):  # "[Card('A', 'spades'), None]" -> [card id, None]
+    cards = []
+    for rank, suit in _TEXT_CARD.findall(value):
+        if not rank:
+            cards.append(None)
+        elif rank in rules.RANKS and suit in rules.SUITS:
+            cards.append(rules.card_id(rank, suit))
+        else:
+            raise SaveError(f"Unknown card {rank} of {suit}")
+    return cards
+
+
+def read_text_save(path):  # returns (state, hands) of a save_data.txt file
+    values = {}
+    with open(path, "r") as file:
+        for line in file:
+            name, separator, value = line.partition(" = ")
+            if separator:
+                values[name.strip()] = value.strip()
+    try:
+        deck = [card for card in _text_cards(values["cards"]) if card is not None]
+        trump = _text_cards(values["trump card"])[0]
+        attack_cards = [card for card in _text_cards(values["Attacker cards played"])
+                        if card is not None]
+        defense_cards = _text_cards(values["Defender cards played"])
+        hands = tuple([card for card in _text_cards(values[name]) if card is not None]
+                      for name in ("Player 1 hand", "Player 2 hand"))
+        trump_taken = values["trump card taken"] == "True"
+        defender = 0 if values["defender"] == "player1" else 1
+        turn = 0 if values["player1_visible"] == "True" else 1
+    except (KeyError, IndexError):
+        raise SaveError(f"{path} is not a complete saved game")
+
+    table = tuple(zip(attack_cards, defense_cards + [None] * len(attack_cards)))
+    state = rules.GameState(tuple(deck), trump, trump_taken,
+                            (rules.mask_of(hands[0]), rules.mask_of(hands[1])), table,
+                            defender, turn)
+    return with_discard(state), hands
+
+
+def convert(text_path, path):  # one-time import of a save_data.txt file
+    save(path, *read_text_save(text_path))
@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import random
+import protocol
+import rules
+from tables import Table, TableRegistry
+
+# durak-server: hosts many two player tables in one process. The server holds the
+# real game state and applies the rules, clients only send moves and show their view.
+#   python server.py --port 5050
+#   python Durak.py --connect localhost:5050
+
+
+def send_views(table):
+    state = table.state
+    for seat, writer in enumerate(table.seats):
+        writer.write(protocol.encode_view(state, seat))
+
+
+class GameServer:
+    def __init__(self, seed=None, idle_after=60.0):
+        self.tables = TableRegistry(idle_after)  # seats are asyncio.StreamWriters
+        self.waiting = {}  # rules profile -> table of a matched game that waits for a player
+        self.next_number = 1
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seed = seed  # game n is dealt by rules.stream(seed, n)
+        self.games = 0
+        self.moves = 0
+        self._evicting = None  # task that evicts the idle tables
+
+    def join(self, writer, number, profile=rules.CLASSIC):
+        # returns (table, seat), or a protocol reason why the player was not seated
+        if profile is None or profile.players != 2:
+            return protocol.BAD_RULES
+        if number == 0:  # any table with the same rules
+            if profile not in self.waiting:
+                while self.next_number in self.tables:
+                    self.next_number += 1
+                self.waiting[profile] = Table(self.next_number, profile)
+                self.tables.add(self.waiting[profile])
+            table = self.waiting[profile]
+        else:  # players who want to play each other agree on a table number
+            table = self.tables.get(number)
+            if table is None:
+                table = Table(number, profile)
+                self.tables.add(table)
+        if None not in table.seats:
+            return protocol.TABLE_FULL
+        if table.profile is not profile:
+            return protocol.OTHER_RULES
+        seat = table.seats.index(None)
+        table.seats[seat] = writer
+        writer.write(protocol.encode_seated(table.number, seat))
+        if None not in table.seats:  # both players are there, deal
+            if self.waiting.get(profile) is table:
+                del self.waiting[profile]
+            table.state = rules.new_game(rules.stream(self.seed, self.games), profile)
+            self.games += 1
+            self.tables.touch(table)
+            send_views(table)
+        return table, seat
+
+    def move(self, table, seat, move):
+        writer = table.seats[seat]
+        self.tables.touch(table)
+        if table.state is None or table.state.turn != seat:
+            writer.write(protocol.encode_rejected(protocol.NOT_YOUR_TURN))
+            return
+        if not rules.is_legal(table.state, move):
+            writer.write(protocol.encode_rejected(protocol.ILLEGAL_MOVE))
+            return
+        table.state = rules.apply(table.state, move, validate=False)
+        self.moves += 1
+        send_views(table)
+        result = rules.winner(table.state)
+        if result is not None:
+            for each in table.seats:
+                each.write(protocol.encode_game_over(result))
+            self.close_table(table)
+
+    def leave(self, table, seat):
+        table.seats[seat] = None
+        if table.state is not None and self.tables.get(table.number) is table:
+            other = table.seats[1 - seat]
+            other.write(protocol.encode_game_over(protocol.LEFT_RESULT))
+            self.close_table(table)
+        elif table.seats == [None, None]:
+            self.close_table(table)
+
+    def close_table(self, table):
+        self.tables.remove(table)
+        if self.waiting.get(table.profile) is table:
+            del self.waiting[table.profile]
+        for writer in table.seats:
+            if writer is not None:
+                writer.close()
+
+    async def handle(self, reader, writer):  # one connected client
+        table = seat = None
+        try:
+            while True:
+                length, = protocol.LENGTH.unpack(await reader.readexactly(protocol.LENGTH.size))
+                body = await reader.readexactly(length)
+                if not body:
+                    raise protocol.ProtocolError("Empty message")
+                if body[0] == protocol.JOIN and table is None:
+                    if len(body) != protocol.JOIN_BODY.size:
+                        raise protocol.ProtocolError("Bad join message")
+                    _, number, profile = protocol.JOIN_BODY.unpack(body)
+                    joined = self.join(writer, number, rules.PROFILES[profile]
+                                       if profile < len(rules.PROFILES) else None)
+                    if not isinstance(joined, tuple):
+                        writer.write(protocol.encode_rejected(joined))
+                        break
+                    table, seat = joined
+                elif body[0] == protocol.MOVE and table is not None:
+                    self.move(table, seat, protocol.decode_move(body))
+                else:
+                    raise protocol.ProtocolError("Unexpected message")
+                if writer.transport.get_write_buffer_size() > 65536:
+                    await writer.drain()  # the client does not read, do not buffer more
+        except (asyncio.IncompleteReadError, ConnectionError, protocol.ProtocolError):
+            pass
+        finally:
+            if table is not None:
+                self.leave(table, seat)
+            writer.close()
+
+    async def evict_idle_tables(self):  # keeps running until the event loop stops
+        while True:
+            await asyncio.sleep(self.tables.idle_after / 2)
+            self.tables.evict_idle()
+
+    async def serve(self, host, port):  # asyncio turns Nagle's algorithm off for every client
+        self._evicting = asyncio.get_running_loop().create_task(self.evict_idle_tables())
+        return await asyncio.start_server(self.handle, host, port)
+
+
+async def run(host, port, seed, idle_after):
+    game_server = GameServer(seed, idle_after)
+    server = await game_server.serve(host, port)
+    print("Serving on " + ", ".join(str(sock.getsockname()) for sock in server.sockets))
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="durak-server", description="Host Durak tables for network players.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("-s", "--seed", type=int, help="deal reproducible games")
+    parser.add_argument("--idle", type=float, default=60.0, metavar="SECONDS",
+                        help="tables without moves for this long are kept compressed "
+                             "(default: %(default)s)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(run(args.host, args.port, args.seed, args.idle))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import random
+from abc import ABC, abstractmethod
+import rules
+
+# headless players for simulations and computer opponents. A strategy picks one of
+# the legal moves for the player whose turn it is and should only look at what that
+# player can see: its own hand, the table, the trump card and the discard pile
+
+
+class Strategy(ABC):
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else random.Random()
+
+    def start_game(self, player):  # a new game starts, the strategy plays for player
+        pass
+
+    def observe(self, state, move, new_state):  # called after every move of both players
+        pass
+
+    @abstractmethod
+    def choose_move(self, state, moves):
+        pass
+
+
+class RandomStrategy(Strategy):  # any legal move, the baseline
+    def choose_move(self, state, moves):
+        return self.rng.choice(moves)
+
+
+class GreedyStrategy(Strategy):  # play the cheapest cards, keep trumps for later
+    def card_cost(self, state, card):
+        cost = rules.rank_of(card)
+        if rules.suit_of(card) == state.trump_suit:
+            cost += len(rules.RANKS)
+        return cost
+
+    def choose_move(self, state, moves):
+        plays = [move for move in moves if move[0] in (rules.ATTACK, rules.DEFEND)]
+        others = [move for move in moves if move[0] not in (rules.ATTACK, rules.DEFEND)]
+        if plays:
+            move = min(plays, key=lambda move: self.card_cost(state, move[1]))
+            if move[0] == rules.DEFEND or not state.table:
+                return move
+            # throw in only cheap cards while the deck still has cards
+            if self.card_cost(state, move[1]) < len(rules.RANKS) or state.deck_empty():
+                return move
+        return others[0] if others else plays[0]
+
+
+STRATEGIES = {
+    "random": RandomStrategy,
+    "greedy": GreedyStrategy,
+}
+
+
+def create(name, rng=None):
+    try:
+        return STRATEGIES[name](rng)
+    except KeyError:
+        raise ValueError(f"Unknown strategy {name!r}, choose from {', '.join(STRATEGIES)}")
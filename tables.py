@@ -0,0 +1,85 @@
+import time
+from collections import OrderedDict
+import rules
+import savefile
+
+# tables of the game server. Every table owns its game: the state is a rules.GameState
+# of card masks and tuples of card ids, there are no card objects or images. A table
+# without moves for idle_after seconds is evicted, its state is kept as a save game
+# (under 100 bytes) and decoded again the first time the table is used.
+
+
+class Table:
+    __slots__ = ("number", "profile", "seats", "last_active", "_state", "_saved")
+
+    def __init__(self, number, profile=rules.CLASSIC):
+        self.number = number
+        self.profile = profile  # rules the table plays
+        self.seats = [None, None]  # connection of the player in each seat
+        self.last_active = time.monotonic()
+        self._state = None  # rules.GameState once both seats are taken
+        self._saved = None  # savefile encoding of the state while the table is evicted
+
+    @property
+    def state(self):
+        if self._saved is not None:  # restored on demand
+            self._state = savefile.decode(self._saved)[0]
+            self._saved = None
+        return self._state
+
+    @state.setter
+    def state(self, state):
+        self._state = state
+        self._saved = None
+
+    @property
+    def evicted(self):
+        return self._saved is not None
+
+    def evict(self):
+        if self._state is not None:
+            self._saved = savefile.encode(self._state)
+            self._state = None
+
+
+class TableRegistry:
+    def __init__(self, idle_after=60.0):
+        self.idle_after = idle_after
+        self._tables = {}  # table number -> Table
+        self._active = OrderedDict()  # tables that are not evicted, least recently used first
+
+    def __len__(self):
+        return len(self._tables)
+
+    def __contains__(self, number):
+        return number in self._tables
+
+    def get(self, number):
+        return self._tables.get(number)
+
+    def add(self, table):
+        self._tables[table.number] = table
+        self.touch(table)
+
+    def remove(self, table):
+        if self._tables.get(table.number) is table:
+            del self._tables[table.number]
+            self._active.pop(table.number, None)
+
+    def touch(self, table, now=None):  # the table is used, it stays in memory
+        table.last_active = time.monotonic() if now is None else now
+        self._active[table.number] = table
+        self._active.move_to_end(table.number)
+
+    def evict_idle(self, now=None):  # returns how many tables were evicted
+        if now is None:
+            now = time.monotonic()
+        evicted = 0
+        while self._active:
+            number, table = next(iter(self._active.items()))
+            if now - table.last_active < self.idle_after:
+                break  # the rest was used even later
+            del self._active[number]
+            table.evict()
+            evicted += 1
+        return evicted
@@ -0,0 +1,146 @@
+import hashlib
+import io
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pygame
+
+IMAGE_DIR = "Images"
+CACHE_DIR = "texture_cache"  # scaled textures as raw RGBA pixels, read back without scaling
+CARD_SIZE = (100, 150)
+
+
+def card_file(rank, suit):  # image file of a card face
+    return f"{rank}_of_{suit}.png"
+
+
+class TextureRegistry:  # decodes every image file once and shares the scaled surfaces
+    def __init__(self, image_dir=IMAGE_DIR, cache_dir=CACHE_DIR):
+        self.image_dir = image_dir
+        self.cache_dir = cache_dir  # None - nothing is cached on disk
+        self._decoded = {}  # file name -> decoded surface
+        self._scaled = {}  # (file name, size) -> scaled surface
+        self._size_users = {}  # size -> number of users that still need it
+        self.cache_hits = 0  # textures preload read from the disk cache
+
+    def card(self, rank, suit, size=CARD_SIZE):  # card face texture
+        return self.get(card_file(rank, suit), size)
+
+    def get(self, file_name, size):  # shared surface of the image scaled to size
+        key = (file_name, size)
+        surface = self._scaled.get(key)
+        if surface is None:
+            surface = pygame.transform.scale(self._decode(file_name), size)
+            self._scaled[key] = surface
+        return surface
+
+    def _decode(self, file_name):
+        surface = self._decoded.get(file_name)
+        if surface is None:
+            surface = self._convert(pygame.image.load(os.path.join(self.image_dir, file_name)))
+            self._decoded[file_name] = surface
+        return surface
+
+    @staticmethod
+    def _convert(surface):  # pixel format of the display, only on the main thread
+        if pygame.display.get_surface() is not None:  # needs a display mode
+            surface = surface.convert_alpha()
+        return surface
+
+    def preload(self, textures, progress=None, workers=None):
+        # textures - (file name, size) pairs. Files are read, decoded and scaled on a
+        # thread pool, progress(done, total) is called on this thread as they arrive
+        missing = list(dict.fromkeys(key for key in textures if key not in self._scaled))
+        if not missing:
+            return
+        with ThreadPoolExecutor(workers) as pool:
+            futures = [pool.submit(self._load_scaled, file_name, size)
+                       for file_name, size in missing]
+            for done, future in enumerate(as_completed(futures), 1):
+                key, surface, cached = future.result()
+                self._scaled[key] = self._convert(surface)
+                self.cache_hits += cached
+                if progress is not None:
+                    progress(done, len(futures))
+
+    def _load_scaled(self, file_name, size):  # runs on a worker thread
+        with open(os.path.join(self.image_dir, file_name), "rb") as file:
+            data = file.read()
+        # the cache file is named by the source bytes and the size, an edited image
+        # never matches the pixels of its old version
+        digest = hashlib.sha1(data + bytes(f"{size[0]}x{size[1]}", "ascii")).hexdigest()
+        cache_path = None
+        if self.cache_dir is not None:
+            cache_path = os.path.join(self.cache_dir, digest + ".rgba")
+            try:
+                with open(cache_path, "rb") as file:
+                    pixels = file.read()
+                if len(pixels) == size[0] * size[1] * 4:
+                    return (file_name, size), pygame.image.frombytes(pixels, size, "RGBA"), True
+            except OSError:
+                pass
+        surface = pygame.transform.scale(pygame.image.load(io.BytesIO(data), file_name), size)
+        if cache_path is not None:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                temporary = cache_path + f".{os.getpid()}.tmp"
+                with open(temporary, "wb") as file:
+                    file.write(pygame.image.tobytes(surface, "RGBA"))
+                os.replace(temporary, cache_path)
+            except OSError:  # a read-only install still starts, just slower
+                pass
+        return (file_name, size), surface, False
+
+    def retain(self, size):  # register a user of the size
+        self._size_users[size] = self._size_users.get(size, 0) + 1
+
+    def release(self, size):  # textures of a size nobody uses any more are evicted
+        users = self._size_users.get(size, 0) - 1
+        if users > 0:
+            self._size_users[size] = users
+            return
+        self._size_users.pop(size, None)
+        for key in [key for key in self._scaled if key[1] == size]:
+            del self._scaled[key]
+
+    def clear(self):
+        self._decoded.clear()
+        self._scaled.clear()
+        self._size_users.clear()
+
+
+registry = TextureRegistry()
+
+
+class TextCache:  # least recently used cache of rendered text surfaces
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self._surfaces = OrderedDict()  # (font, text, color, antialias) -> surface
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, antialias, color):  # same arguments as font.render
+        key = (font, text, tuple(color), antialias)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_size:
+            self._surfaces.popitem(last=False)  # drop the least recently used text
+        return surface
+
+    def reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self._surfaces.clear()
+        self.reset_counters()
+
+
+text_cache = TextCache()